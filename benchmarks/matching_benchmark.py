@@ -0,0 +1,307 @@
+"""
+Matching benchmark - accuracy and throughput of model extraction and matching
+
+Runs ModelExtractor.extract_model, normalize_for_matching, match_models and
+the builder's matching pass over a labeled corpus of real product names
+(all retailers + inventory) and writes a JSON result file for diffing.
+
+Usage:
+    python benchmarks/matching_benchmark.py
+    python benchmarks/matching_benchmark.py --compare benchmarks/results/matching_20251101_120000.json
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from build_price_comparison import PriceComparisonBuilder
+from utils.excel_writer import normalize_products
+from utils.model_extractor import ModelExtractor
+
+BENCH_DIR = Path(__file__).parent
+CORPUS_FILE = BENCH_DIR / 'corpus' / 'matching_corpus.csv'
+RESULTS_DIR = BENCH_DIR / 'results'
+
+
+def load_corpus(path: Path = CORPUS_FILE) -> List[Dict]:
+    """
+    Load labeled corpus
+
+    Returns:
+        List of {'source', 'name', 'expected_model', 'variant_group'} where
+        expected_model is the normalized model ('' if the name carries no usable
+        model code) and variant_group the base model its colour/finish variants
+        share (EC9255M, EC9255T -> EC9255)
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def latency_stats(samples_ns: List[int]) -> Dict:
+    """Throughput and p50/p99 latency from per-call timings (nanoseconds)"""
+    ordered = sorted(samples_ns)
+    total_s = sum(ordered) / 1e9
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))] / 1000
+
+    return {
+        'calls': len(ordered),
+        'per_sec': round(len(ordered) / total_s, 1) if total_s else None,
+        'p50_us': round(percentile(0.50), 2),
+        'p99_us': round(percentile(0.99), 2),
+    }
+
+
+def accuracy_stats(tp: int, fp: int, fn: int, variant: int = 0) -> Dict:
+    """
+    Precision/recall/F1 from confusion counts
+
+    variant matches (same variant group, different model - the fuzzy matching
+    of colour variants) count as correct for precision; recall is against exact
+    model pairs only. 'exact_precision' treats variant matches as false.
+    """
+    precision = (tp + variant) / (tp + variant + fp) if tp + variant + fp else 0.0
+    exact_precision = tp / (tp + variant + fp) if tp + variant + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    return {
+        'tp': tp, 'variant': variant, 'fp': fp, 'fn': fn,
+        'precision': round(precision, 4),
+        'exact_precision': round(exact_precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(f1, 4),
+    }
+
+
+def same_model(a: Dict, b: Dict) -> bool:
+    """Both names labeled with the same model"""
+    return bool(a['expected_model']) and a['expected_model'] == b['expected_model']
+
+
+def same_variant_group(a: Dict, b: Dict) -> bool:
+    """Both names labeled as variants of one base model (including the same model)"""
+    return bool(a['variant_group']) and a['variant_group'] == b['variant_group']
+
+
+class MatchingBenchmark:
+    """Measure speed and accuracy of the matching pipeline on the corpus"""
+
+    def __init__(self, corpus: List[Dict], rounds: int = 5):
+        self.corpus = corpus
+        self.rounds = rounds
+        self.inventory = [item for item in corpus if item['source'] == 'INVENTORY']
+        self.scraped = [item for item in corpus if item['source'] != 'INVENTORY']
+
+    def _time_calls(self, func: Callable, args_list: List[tuple]) -> List[int]:
+        """Time each call individually over all rounds"""
+        samples = []
+        for _ in range(self.rounds):
+            for args in args_list:
+                start = time.perf_counter_ns()
+                func(*args)
+                samples.append(time.perf_counter_ns() - start)
+        return samples
+
+    def bench_extract_model(self) -> Dict:
+        """extract_model + normalization vs expected model, per name"""
+        tp = fp = fn = 0
+        failures = []
+        for item in self.corpus:
+            predicted = ModelExtractor.normalize_for_matching(ModelExtractor.extract_model(item['name']) or '')
+            expected = item['expected_model']
+
+            if predicted and predicted == expected:
+                tp += 1
+                continue
+            if predicted:
+                fp += 1
+            if expected:
+                fn += 1
+            failures.append({'source': item['source'], 'name': item['name'],
+                             'expected': expected, 'predicted': predicted})
+
+        return {
+            'speed': latency_stats(self._time_calls(ModelExtractor.extract_model,
+                                                    [(item['name'],) for item in self.corpus])),
+            'accuracy': accuracy_stats(tp, fp, fn),
+            'failures': failures,
+        }
+
+    def bench_normalize_for_matching(self) -> Dict:
+        """normalize_for_matching speed on extracted models"""
+        models = [ModelExtractor.extract_model(item['name']) for item in self.corpus]
+        return {
+            'speed': latency_stats(self._time_calls(ModelExtractor.normalize_for_matching,
+                                                    [(m,) for m in models if m])),
+        }
+
+    def bench_match_models(self) -> Dict:
+        """match_models on every inventory × scraped pair"""
+        inv_models = [ModelExtractor.extract_model(item['name']) for item in self.inventory]
+        scr_models = [ModelExtractor.extract_model(item['name']) for item in self.scraped]
+
+        tp = variant = fp = fn = 0
+        pairs = []
+        for inv_item, inv_model in zip(self.inventory, inv_models):
+            for scr_item, scr_model in zip(self.scraped, scr_models):
+                pairs.append((inv_model, scr_model))
+                truth = same_model(inv_item, scr_item)
+                predicted = ModelExtractor.match_models(inv_model, scr_model)
+                tp += truth and predicted
+                fn += truth and not predicted
+                if predicted and not truth:
+                    if same_variant_group(inv_item, scr_item):
+                        variant += 1
+                    else:
+                        fp += 1
+
+        return {
+            'speed': latency_stats(self._time_calls(ModelExtractor.match_models, pairs)),
+            'accuracy': accuracy_stats(tp, fp, fn, variant),
+        }
+
+    def _run_builder_pass(self) -> PriceComparisonBuilder:
+        """Run the builder's matching pass on the corpus (output suppressed)"""
+        builder = PriceComparisonBuilder()
+        builder.inventory = pd.DataFrame(
+            [{'name': item['name'], 'quantity': 1, 'price': 100.0} for item in self.inventory]
+        )
+        rows_by_source = {}
+        for item in self.scraped:
+            rows_by_source.setdefault(item['source'], []).append({'name': item['name'], 'price': 100.0})
+        builder.scraped_data = {
+            source: normalize_products(pd.DataFrame(rows), source) for source, rows in rows_by_source.items()
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            builder.extract_models_from_all_sources()
+        return builder
+
+    def bench_builder_matching(self) -> Dict:
+        """Builder grouping: inventory ↔ competitor pairs vs labeled truth"""
+        samples = []
+        for _ in range(self.rounds):
+            start = time.perf_counter_ns()
+            builder = self._run_builder_pass()
+            samples.append(time.perf_counter_ns() - start)
+
+        predicted = set()
+        for products in builder.model_map.values():
+            inv_names = {p['name'] for p in products if p['source'] == 'INVENTORY'}
+            for p in products:
+                if p['source'] != 'INVENTORY':
+                    predicted |= {(inv_name, p['source'], p['name']) for inv_name in inv_names}
+
+        truth, variants = set(), set()
+        for inv in self.inventory:
+            for scr in self.scraped:
+                pair = (inv['name'], scr['source'], scr['name'])
+                if same_model(inv, scr):
+                    truth.add(pair)
+                elif same_variant_group(inv, scr):
+                    variants.add(pair)
+
+        speed = latency_stats(samples)
+        speed['names_per_sec'] = round(len(self.corpus) / (sum(samples) / len(samples) / 1e9), 1)
+
+        variant_matches = predicted & variants
+        false_matches = predicted - truth - variants
+        return {
+            'speed': speed,
+            'accuracy': accuracy_stats(len(predicted & truth), len(false_matches), len(truth - predicted),
+                                       len(variant_matches)),
+            'variant_matches': sorted(list(p) for p in variant_matches),
+            'false_matches': sorted(list(p) for p in false_matches),
+            'missed_matches': sorted(list(p) for p in truth - predicted),
+        }
+
+    def run(self) -> Dict:
+        """Run all benchmarks"""
+        return {
+            'meta': {
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'git_commit': _git_commit(),
+                'python': platform.python_version(),
+                'corpus_size': len(self.corpus),
+                'corpus_labeled': sum(1 for item in self.corpus if item['expected_model']),
+                'rounds': self.rounds,
+            },
+            'extract_model': self.bench_extract_model(),
+            'normalize_for_matching': self.bench_normalize_for_matching(),
+            'match_models': self.bench_match_models(),
+            'builder_matching': self.bench_builder_matching(),
+        }
+
+
+def _git_commit() -> Optional[str]:
+    """Current commit hash, if running inside the git repo"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=str(BENCH_DIR), timeout=10,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def print_summary(results: Dict, previous: Optional[Dict] = None):
+    """Print one line per benchmark, with deltas against a previous result"""
+    print(f"\n{'Benchmark':25s} {'per sec':>12s} {'p50 us':>9s} {'p99 us':>9s} {'prec':>7s} {'exact':>7s} {'recall':>7s}")
+    print("-" * 82)
+    for name, result in results.items():
+        if name == 'meta':
+            continue
+        speed = result['speed']
+        acc = result.get('accuracy', {})
+        line = (f"{name:25s} {speed.get('names_per_sec', speed['per_sec']):>12} {speed['p50_us']:>9} "
+                f"{speed['p99_us']:>9} {acc.get('precision', '-'):>7} {acc.get('exact_precision', '-'):>7} {acc.get('recall', '-'):>7}")
+
+        if previous and name in previous:
+            prev_acc = previous[name].get('accuracy', {})
+            if acc and prev_acc:
+                line += (f"  (prec {acc['precision'] - prev_acc['precision']:+.4f},"
+                         f" recall {acc['recall'] - prev_acc['recall']:+.4f})")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Matching accuracy and throughput benchmark')
+    parser.add_argument('--rounds', type=int, default=5, help='Timing rounds per benchmark')
+    parser.add_argument('--output', type=Path, help='Result JSON path (default: benchmarks/results/)')
+    parser.add_argument('--compare', type=Path, help='Previous result JSON to compare against')
+    args = parser.parse_args()
+
+    results = MatchingBenchmark(load_corpus(), rounds=args.rounds).run()
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"matching_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+
+    print_summary(results, previous)
+    print(f"\n[OK] Results saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
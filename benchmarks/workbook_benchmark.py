@@ -0,0 +1,126 @@
+"""
+Workbook benchmark - price_comparison_*.xlsx writer time and peak memory
+
+Builds a synthetic comparison with the builder's sheet layout (Price
+Comparison, Statistics, one sheet per source, INVENTORY) and writes it with
+pd.ExcelWriter(engine='openpyxl') and with the streaming write_workbook().
+
+Usage:
+    python benchmarks/workbook_benchmark.py
+    python benchmarks/workbook_benchmark.py --rows 50000 --memory
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.workbook_writer import write_workbook
+
+SOURCES = ['DIM_KAVA', 'ALTA', 'KONTAKT', 'ELITE', 'COFFEEHUB', 'COFFEEPIN', 'VELI_STORE', 'VEGA_GE']
+
+
+def build_sheets(rows: int, seed: int = 0) -> List[Tuple[str, pd.DataFrame]]:
+    """Synthetic comparison workbook content with `rows` products"""
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(20, 4000, rows).round(2)
+
+    comparison = pd.DataFrame({
+        'Quantity': rng.integers(1, 50, rows),
+        'Model': [f'ECAM{i:06d}B' for i in range(rows)],
+        'Product Name': [f'DeLonghi ECAM{i:06d}B Coffee Machine' for i in range(rows)],
+        'Our Cost': prices,
+        'Our Price': prices,
+    })
+    for source in SOURCES:
+        regular = (prices * rng.uniform(0.8, 1.3, rows)).round(2)
+        discount = (regular * 0.85).round(2)
+        on_sale = rng.random(rows) < 0.3
+        present = rng.random(rows) < 0.6
+        comparison[source] = np.where(
+            ~present, '-',
+            np.where(on_sale,
+                     pd.Series(regular).map('{:.2f}'.format) + ' \\ ' + pd.Series(discount).map('{:.2f}'.format),
+                     pd.Series(regular).map('{:.2f}'.format)),
+        )
+
+    sheets = [
+        ('Price Comparison', comparison),
+        ('Statistics', pd.DataFrame([{'Total Products': rows, 'Total Quantity': int(comparison['Quantity'].sum())}])),
+    ]
+    for source in SOURCES:
+        sheets.append((source, pd.DataFrame({
+            'Product Name': comparison['Product Name'],
+            'Price': prices,
+            'Regular Price': prices,
+            'Discount Price': np.where(rng.random(rows) < 0.3, prices * 0.85, np.nan),
+            'Has Discount': rng.random(rows) < 0.3,
+            'URL': [f'https://example.ge/{source.lower()}/{i}' for i in range(rows)],
+        })))
+    sheets.append(('INVENTORY', pd.DataFrame({
+        'Product Name': comparison['Product Name'],
+        'Quantity': comparison['Quantity'],
+        'Our Cost Price': prices,
+    })))
+    return sheets
+
+
+def write_pandas(file_path: Path, sheets: List[Tuple[str, pd.DataFrame]]):
+    """Previous save_comparison implementation"""
+    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+        for sheet_name, df in sheets:
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def measure(writer: Callable, file_path: Path, sheets: List[Tuple[str, pd.DataFrame]], memory: bool = False) -> Dict:
+    """Wall time and file size of one write, plus peak traced memory of a second (traced) write"""
+    start = time.perf_counter()
+    writer(file_path, sheets)
+    result = {
+        'seconds': round(time.perf_counter() - start, 2),
+        'size_kb': round(file_path.stat().st_size / 1024, 1),
+        'peak_mb': '-',
+    }
+
+    # tracemalloc slows allocation-heavy code several times - never time a traced run
+    if memory:
+        tracemalloc.start()
+        writer(file_path, sheets)
+        result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparison workbook writer benchmark')
+    parser.add_argument('--rows', type=int, default=10000, help='Products in the comparison')
+    parser.add_argument('--memory', action='store_true', help='Also measure peak memory (slow)')
+    args = parser.parse_args()
+
+    sheets = build_sheets(args.rows)
+    total_rows = sum(len(df) for _, df in sheets)
+    print(f"Workbook: {len(sheets)} sheets, {total_rows} rows ({args.rows} products)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            'pandas ExcelWriter': measure(write_pandas, Path(tmp) / 'pandas.xlsx', sheets, args.memory),
+            'write_workbook': measure(write_workbook, Path(tmp) / 'streaming.xlsx', sheets, args.memory),
+        }
+
+    print(f"\n{'Writer':20s} {'seconds':>9s} {'peak MB':>9s} {'size KB':>9s}")
+    print("-" * 50)
+    for name, result in results.items():
+        print(f"{name:20s} {result['seconds']:>9} {result['peak_mb']:>9} {result['size_kb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
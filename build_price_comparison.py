@@ -3,11 +3,22 @@ Build price comparison table from scraped data and inventory
 Matches products by model codes and creates comparison report
 """
 
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from utils.model_extractor import ModelExtractor
+from utils.batch_matcher import BatchMatcher
+from utils.inventory_loader import load_inventory
+from utils.excel_writer import load_products
+from utils.workbook_writer import write_workbook
+from utils.price_matrix import PriceMatrix
+from utils.price_columns import COMPETITORS, PRICES_SHEET, SOURCES, format_display_prices, price_column, price_columns
+from utils.output_manifest import COMPARISON_SOURCE, SCRAPER_PATTERNS, latest_output, record_output
+
+# Percentiles of our price position reported in the Statistics sheet
+POSITION_PERCENTILES = (25, 50, 75)
 
 class PriceComparisonBuilder:
     """Build price comparison table"""
@@ -23,6 +34,9 @@ class PriceComparisonBuilder:
         
         # Model mapping: model -> list of products from different sources
         self.model_map = {}
+        
+        # Numeric competitor prices, row-aligned with the comparison table
+        self.prices = pd.DataFrame(columns=['Model'] + price_columns())
     
     def load_inventory(self) -> pd.DataFrame:
         """Load inventory from остатки.xls"""
@@ -33,43 +47,8 @@ class PriceComparisonBuilder:
             print("[WARNING] Inventory file not found")
             return pd.DataFrame()
         
-        df = pd.read_excel(file_path, header=None)
-        
-        products = []
-        for i in range(len(df)):
-            row = df.iloc[i]
-            row_values = [v for v in row.values if pd.notna(v)]
-            
-            if len(row_values) < 4:
-                continue
-            
-            row_str = ' '.join([str(v) for v in row_values])
-            if 'delonghi' not in row_str.lower() and 'melitta' not in row_str.lower() and 'nivona' not in row_str.lower():
-                continue
-            
-            try:
-                name = qty = price = None
-                
-                if len(row_values) == 5:
-                    name, qty, price = str(row_values[1]), row_values[2], row_values[3]
-                elif len(row_values) == 6:
-                    name, qty, price = str(row_values[1]), row_values[3], row_values[4]
-                elif len(row_values) == 7:
-                    name, qty, price = str(row_values[1]), row_values[4], row_values[5]
-                
-                if name and ('delonghi' in name.lower() or 'melitta' in name.lower() or 'nivona' in name.lower()):
-                    if isinstance(qty, (int, float)) and isinstance(price, (int, float)):
-                        if qty > 0 and price > 0:
-                            products.append({
-                                'name': name,
-                                'quantity': int(qty),
-                                'price': float(price),
-                                'source': 'INVENTORY'
-                            })
-            except:
-                pass
-        
-        df_result = pd.DataFrame(products)
+        # Layout detection + vectorized parse, cached as Parquet sidecar
+        df_result = load_inventory(file_path)
         print(f"[OK] Loaded {len(df_result)} products from INVENTORY")
         return df_result
     
@@ -77,31 +56,17 @@ class PriceComparisonBuilder:
         """Load all scraped data"""
         print("\n[2/6] Loading SCRAPED DATA...")
         
-        sources = {
-            'ALTA': 'alta_*_prices_*.xlsx',
-            'KONTAKT': 'kontakt_*_prices_*.xlsx',
-            'ELITE': 'elite_*_prices_*.xlsx',
-            'DIM_KAVA': 'dimkava_*_prices_*.xlsx',
-            'COFFEEHUB': 'coffeehub_prices_*.xlsx',
-            'COFFEEPIN': 'coffeepin_prices_*.xlsx',
-            'VELI_STORE': 'veli_store_prices_*.xlsx',
-            'VEGA_GE': 'vega_ge_prices_*.xlsx',
-        }
-        
         result = {}
         
-        for source_name, pattern in sources.items():
-            files = list(self.output_dir.glob(pattern))
-            if not files:
+        for source_name in SCRAPER_PATTERNS:
+            # Latest file per source from the output manifest
+            latest_file = latest_output(source_name, self.output_dir)
+            if latest_file is None:
                 print(f"[WARNING] {source_name}: No files found")
                 continue
             
-            # Get latest file
-            latest_file = max(files, key=lambda x: x.stat().st_mtime)
-            df = pd.read_excel(latest_file)
-            
-            # Add source column
-            df['source'] = source_name
+            # Parquet product file (older runs: xlsx), normalized to one schema
+            df = load_products(latest_file, source_name)
             
             result[source_name] = df
             print(f"[OK] {source_name}: {len(df)} products from {latest_file.name}")
@@ -142,25 +107,11 @@ class PriceComparisonBuilder:
                     # Normalize for matching
                     model_normalized = ModelExtractor.normalize_for_matching(model)
                     
-                    # Normalize price data for different scraper formats
-                    if 'final_price' in row:
-                        # ALTA/KONTAKT/ELITE format
-                        price = row['final_price']
-                        regular_price = row.get('regular_price')
-                        discount_price = row.get('discount_price')
-                        has_discount = row.get('has_discount', False)
-                    elif 'price' in row:
-                        # CoffeeHub format
-                        price = row['price']
-                        regular_price = row.get('price') if not pd.isna(row.get('price')) else None
-                        discount_price = row.get('discount_price') if not pd.isna(row.get('discount_price')) else None
-                        has_discount = discount_price is not None and discount_price != price
-                    else:
-                        # Fallback
-                        price = row.get('price', 0)
-                        regular_price = row.get('regular_price', price)
-                        discount_price = row.get('discount_price')
-                        has_discount = row.get('has_discount', False)
+                    # Prices are already normalized by load_products()
+                    price = row['price']
+                    regular_price = row['regular_price'] if not pd.isna(row['regular_price']) else None
+                    discount_price = row['discount_price'] if not pd.isna(row['discount_price']) else None
+                    has_discount = bool(row['has_discount'])
                     
                     all_products.append({
                         'source': source_name,
@@ -182,35 +133,44 @@ class PriceComparisonBuilder:
                 self.model_map[model_norm] = []
             self.model_map[model_norm].append(product)
         
-        # Second pass: fuzzy matching for unmatched inventory items
+        # Second pass: batch fuzzy matching for unmatched inventory items
+        # EC9255 should match EC9255M, ECAM22.114.B should match ECAM22.114.SB
         inventory_products = [p for p in all_products if p['source'] == 'INVENTORY']
-        scraped_products = [p for p in all_products if p['source'] != 'INVENTORY']
+        inventory_models = {p['model_normalized'] for p in inventory_products}
         
-        fuzzy_matches = 0
+        # One entry per model group that has no competitors yet
+        unmatched = {}
         for inv_product in inventory_products:
-            # Check if already has matches
-            if len([p for p in self.model_map[inv_product['model_normalized']] if p['source'] != 'INVENTORY']) > 0:
-                continue  # Already has competitors
-            
-            # Try fuzzy matching - look for base model match
-            inv_norm = inv_product['model_normalized']
+            model_norm = inv_product['model_normalized']
+            if not any(p['source'] != 'INVENTORY' for p in self.model_map[model_norm]):
+                unmatched.setdefault(model_norm, inv_product)
+        unmatched = list(unmatched.values())
+        
+        fuzzy_matches = 0
+        matcher = BatchMatcher()
+        for source_name in self.scraped_data:
+            # Listings already grouped with an inventory model are taken
+            candidates = [
+                p for p in all_products
+                if p['source'] == source_name and p['model_normalized'] not in inventory_models
+            ]
+            if not unmatched or not candidates:
+                continue
             
-            for scraped_product in scraped_products:
-                scraped_norm = scraped_product['model_normalized']
-                
-                # Check if one is substring of another (base model match)
-                # EC9255 should match EC9255M, EC9255T
-                # ECI341 should match ECI341BK, ECI341BZ
-                if len(inv_norm) >= 5 and len(scraped_norm) >= 5:
-                    if inv_norm in scraped_norm or scraped_norm in inv_norm:
-                        # Add to same group
-                        if scraped_product not in self.model_map[inv_norm]:
-                            self.model_map[inv_norm].append(scraped_product)
-                            fuzzy_matches += 1
+            # One-to-one per source: a listing is attached to at most one inventory row
+            pairs = matcher.match(
+                [p['model_normalized'] for p in unmatched],
+                [p['model_normalized'] for p in candidates],
+                [p['name'] for p in unmatched],
+                [p['name'] for p in candidates],
+            )
+            for inv_idx, cand_idx, score in pairs:
+                self.model_map[unmatched[inv_idx]['model_normalized']].append(candidates[cand_idx])
+                fuzzy_matches += 1
         
         print(f"[OK] Extracted {len(all_products)} products")
         print(f"[OK] Found {len(self.model_map)} unique normalized models")
-        print(f"[OK] Added {fuzzy_matches} fuzzy matches (base model matching)")
+        print(f"[OK] Added {fuzzy_matches} fuzzy matches (batch base model matching)")
         
         return all_products
     
@@ -219,6 +179,7 @@ class PriceComparisonBuilder:
         print("\n[4/6] Building COMPARISON TABLE...")
         
         rows = []
+        price_rows = []
         
         for model_norm, products in sorted(self.model_map.items()):
             # Find inventory product
@@ -244,29 +205,34 @@ class PriceComparisonBuilder:
                 'Our Price': inventory_product['price'],
             }
             
-            # Add competitor prices - DIM_KAVA first (our website), then others
-            for source in ['DIM_KAVA', 'ALTA', 'KONTAKT', 'ELITE', 'COFFEEHUB', 'COFFEEPIN', 'VELI_STORE', 'VEGA_GE']:
+            # Competitor prices as numbers - display strings are rendered from them
+            price_row = {'Model': inventory_product['model']}
+            for source in SOURCES:
+                regular = discount = final = np.nan
                 if source in competitor_products:
                     p = competitor_products[source]
                     if p['has_discount'] and p['regular_price'] and p['discount_price']:
-                        row[source] = f"{p['regular_price']:.2f} \\ {p['discount_price']:.2f}"
+                        regular, discount, final = p['regular_price'], p['discount_price'], p['discount_price']
                     else:
                         # Use regular_price if available and valid, otherwise price
                         regular_price = p.get('regular_price')
                         price = p.get('price')
                         
                         if regular_price and not pd.isna(regular_price):
-                            row[source] = f"{regular_price:.2f}"
+                            regular = final = regular_price
                         elif price and not pd.isna(price):
-                            row[source] = f"{price:.2f}"
-                        else:
-                            row[source] = '-'
-                else:
-                    row[source] = '-'
+                            regular = final = price
+                
+                price_row[price_column(source, 'regular')] = regular
+                price_row[price_column(source, 'discount')] = discount
+                price_row[price_column(source, 'final')] = final
             
             rows.append(row)
+            price_rows.append(price_row)
         
-        df = pd.DataFrame(rows)
+        # Display columns follow SOURCES: DIM_KAVA first (our website), then others
+        self.prices = pd.DataFrame(price_rows, columns=['Model'] + price_columns())
+        df = pd.concat([pd.DataFrame(rows), format_display_prices(self.prices)], axis=1)
 
         # If no rows matched (e.g., no competitors found), return empty-safe dataframe
         if df.empty:
@@ -280,6 +246,7 @@ class PriceComparisonBuilder:
         # Sort by model if column exists
         if 'Model' in df.columns:
             df = df.sort_values('Model')
+            self.prices = self.prices.loc[df.index]
         
         print(f"[OK] Created comparison table with {len(df)} products")
         
@@ -292,53 +259,59 @@ class PriceComparisonBuilder:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_file = self.output_dir / f'price_comparison_{timestamp}.xlsx'
         
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            # Main comparison sheet
-            df.to_excel(writer, sheet_name='Price Comparison', index=False)
-            
-            # Add statistics sheet
-            stats = self.calculate_statistics(df)
-            stats_df = pd.DataFrame([stats])
-            stats_df.to_excel(writer, sheet_name='Statistics', index=False)
-            
-            # Add individual source sheets with full scraped data
-            print("  Adding individual source sheets...")
-            for source_name, source_df in self.scraped_data.items():
-                if not source_df.empty:
-                    # Select relevant columns
-                    cols = ['name', 'price', 'regular_price', 'discount_price', 'has_discount', 'url']
-                    available_cols = [c for c in cols if c in source_df.columns]
-                    sheet_df = source_df[available_cols].copy()
-                    
-                    # Rename for clarity
-                    sheet_df = sheet_df.rename(columns={
-                        'name': 'Product Name',
-                        'price': 'Price',
-                        'regular_price': 'Regular Price',
-                        'discount_price': 'Discount Price',
-                        'has_discount': 'Has Discount',
-                        'url': 'URL'
-                    })
-                    
-                    sheet_df.to_excel(writer, sheet_name=source_name, index=False)
-                    print(f"    [{source_name}] {len(sheet_df)} products")
-            
-            # Add INVENTORY sheet with our stock
-            inventory_data = self.load_inventory()
-            if not inventory_data.empty:
-                inventory_sheet = inventory_data[['name', 'quantity', 'price']].copy()
-                inventory_sheet = inventory_sheet.rename(columns={
-                    'name': 'Product Name',
-                    'quantity': 'Quantity',
-                    'price': 'Our Cost Price'
-                })
-                inventory_sheet.to_excel(writer, sheet_name='INVENTORY', index=False)
-                print(f"    [INVENTORY] {len(inventory_sheet)} products")
+        # Sheets are streamed one at a time (write-only workbook)
+        write_workbook(output_file, self._comparison_sheets(df))
         
+        record_output(COMPARISON_SOURCE, output_file, row_count=len(df))
         print(f"[OK] Saved to: {output_file.name}")
         
         return output_file
     
+    def _comparison_sheets(self, df: pd.DataFrame):
+        """Yield (sheet name, DataFrame) for the comparison workbook, in order"""
+        # Main comparison sheet
+        yield 'Price Comparison', df
+        
+        # Add statistics sheet
+        stats = self.calculate_statistics(df)
+        yield 'Statistics', pd.DataFrame([stats])
+        
+        # Machine-readable prices (numbers instead of "regular \\ discount" strings)
+        yield PRICES_SHEET, self.prices
+        
+        # Add individual source sheets with full scraped data
+        print("  Adding individual source sheets...")
+        for source_name, source_df in self.scraped_data.items():
+            if not source_df.empty:
+                # Select relevant columns
+                cols = ['name', 'price', 'regular_price', 'discount_price', 'has_discount', 'url']
+                available_cols = [c for c in cols if c in source_df.columns]
+                sheet_df = source_df[available_cols]
+                
+                # Rename for clarity
+                sheet_df = sheet_df.rename(columns={
+                    'name': 'Product Name',
+                    'price': 'Price',
+                    'regular_price': 'Regular Price',
+                    'discount_price': 'Discount Price',
+                    'has_discount': 'Has Discount',
+                    'url': 'URL'
+                })
+                
+                yield source_name, sheet_df
+                print(f"    [{source_name}] {len(sheet_df)} products")
+        
+        # Add INVENTORY sheet with our stock (already loaded in run())
+        inventory_data = self.inventory if self.inventory is not None else self.load_inventory()
+        if not inventory_data.empty:
+            inventory_sheet = inventory_data[['name', 'quantity', 'price']].rename(columns={
+                'name': 'Product Name',
+                'quantity': 'Quantity',
+                'price': 'Our Cost Price'
+            })
+            yield 'INVENTORY', inventory_sheet
+            print(f"    [INVENTORY] {len(inventory_sheet)} products")
+    
     def calculate_statistics(self, df: pd.DataFrame) -> Dict:
         """Calculate comparison statistics"""
         print("\n[6/6] Calculating STATISTICS...")
@@ -360,17 +333,31 @@ class PriceComparisonBuilder:
             ),
         }
         
-        # Count competitors per product
-        competitor_cols = ['ALTA', 'KONTAKT', 'ELITE', 'DIM_KAVA']
-        df['Competitor Count'] = df[competitor_cols].apply(
-            lambda row: sum(1 for v in row if v != '-'), axis=1
-        )
+        # Competitive statistics - column operations over the price matrix
+        matrix = PriceMatrix.from_comparison(df, self.prices)
+        df['Competitor Count'] = matrix.competitor_count()
         
         stats['Avg Competitors per Product'] = df['Competitor Count'].mean()
         stats['Products with 1+ Competitors'] = (df['Competitor Count'] >= 1).sum()
         stats['Products with 2+ Competitors'] = (df['Competitor Count'] >= 2).sum()
         stats['Products with 3+ Competitors'] = (df['Competitor Count'] >= 3).sum()
         
+        # Share of products each source has a price for
+        for source, share in matrix.coverage().items():
+            stats[f'Coverage {source} %'] = share * 100
+        
+        # Where our retail price sits among competitors (0% = cheapest, 100% = most expensive)
+        # and how far it is from the cheapest competitor, over products with competitors
+        competitors = matrix.select(COMPETITORS)
+        position = competitors.price_position() * 100
+        position = position[~np.isnan(position)]
+        for percentile in POSITION_PERCENTILES:
+            stats[f'Price Position P{percentile} %'] = np.percentile(position, percentile) if position.size else np.nan
+        
+        gap = competitors.gap_to_min() * 100
+        gap = gap[~np.isnan(gap)]
+        stats['Median Gap to Cheapest Competitor %'] = np.median(gap) if gap.size else np.nan
+        
         print(f"[OK] Statistics calculated")
         
         return stats
@@ -0,0 +1,264 @@
+"""
+Test script for SQL statement counts of web app pages
+Pages must issue a constant number of queries, not one per product (N+1)
+
+Usage:
+    python docs/testing/test_query_counts.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+COMPETITORS = ['DIM_KAVA', 'ALTA', 'KONTAKT', 'ELITE']
+
+# Config reads DATABASE_URL once at import - all tests share one database
+TEST_DIR = Path(tempfile.mkdtemp())
+os.environ['DATABASE_URL'] = f"sqlite:///{TEST_DIR / 'queries.db'}"
+os.environ['SECRET_KEY'] = 'test-secret-key'
+os.environ['CACHE_GENERATION_FILE'] = str(TEST_DIR / 'cache_generation')
+
+
+class StatementCounter:
+    """Count SQL statements executed on an engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def create_test_app():
+    """App on an empty SQLite database, login not required"""
+    from web_app.app import create_app
+    from web_app.database import db
+
+    app = create_app('production')
+    app.config['LOGIN_DISABLED'] = True
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed_upload(db, upload_date, product_count):
+    """Upload with product_count products, each priced by every competitor"""
+    from web_app.models import Upload, Product, CompetitorPrice, Statistic
+
+    upload = Upload(file_name=f'price_comparison_{upload_date}.xlsx', upload_date=upload_date,
+                    total_products=product_count)
+    db.session.add(upload)
+    db.session.flush()
+
+    for i in range(product_count):
+        product = Product(upload_id=upload.id, model=f'ECAM{i:04d}', name=f'DeLonghi ECAM{i:04d}',
+                          quantity=1, our_price=1000 + i, brand='DeLonghi')
+        db.session.add(product)
+        db.session.flush()
+        for j, competitor in enumerate(COMPETITORS):
+            db.session.add(CompetitorPrice(product_id=product.id, competitor=competitor,
+                                           price=990 + i + j, regular_price=990 + i + j))
+
+    db.session.add(Statistic(upload_id=upload.id, total_value=0, avg_price=0))
+    db.session.commit()
+    return upload
+
+
+def test_comparison_page():
+    """/comparison/date/<date> issues the same number of statements for 5 and 50 products"""
+    print("\n=== Testing Comparison Page Queries ===")
+
+    app = create_test_app()
+
+    from web_app.database import db
+
+    with app.app_context():
+        small = date.today() - timedelta(days=1)
+        large = date.today()
+        seed_upload(db, small, 5)
+        seed_upload(db, large, 50)
+
+        client = app.test_client()
+        counts = {}
+        for label, upload_date in [('5 products', small), ('50 products', large)]:
+            db.session.remove()
+            with StatementCounter(db.engine) as counter:
+                response = client.get(f'/comparison/date/{upload_date.isoformat()}')
+            assert response.status_code == 200, f"HTTP {response.status_code}"
+            assert b'ECAM0004' in response.data, "Products not rendered"
+            counts[label] = counter.count
+            print(f"  {label:12} -> {counter.count} SQL statements")
+
+        db.session.remove()
+
+    assert counts['5 products'] == counts['50 products'], \
+        f"Statement count grows with the number of products (N+1): {counts}"
+
+    print("\n✓ Statement count is constant!")
+
+
+def test_filter_endpoint():
+    """/comparison/filter issues the same number of statements for 5 and 50 products"""
+    print("\n=== Testing Filter Endpoint Queries ===")
+
+    app = create_test_app()
+
+    from web_app.database import db
+
+    with app.app_context():
+        uploads = {
+            '5 products': seed_upload(db, date.today() - timedelta(days=1), 5).id,
+            '50 products': seed_upload(db, date.today(), 50).id,
+        }
+
+        client = app.test_client()
+        counts = {}
+        for label, upload_id in uploads.items():
+            db.session.remove()
+            with StatementCounter(db.engine) as counter:
+                response = client.post('/comparison/filter', data={
+                    'upload_id': upload_id, 'competitor': 'ALTA', 'cheaper': 'true',
+                })
+            data = response.get_json()
+            assert response.status_code == 200 and data['success'], data
+            assert data['count'] > 0, "No products matched"
+            assert len(data['products'][0]['competitors']) == len(COMPETITORS), "Competitors missing"
+            counts[label] = counter.count
+            print(f"  {label:12} -> {counter.count} SQL statements ({data['count']} products)")
+
+        db.session.remove()
+
+    assert counts['5 products'] == counts['50 products'], \
+        f"Statement count grows with the number of products (N+1): {counts}"
+
+    print("\n✓ Statement count is constant!")
+
+
+def test_excel_export():
+    """/comparison/export/<id> issues the same number of statements for 5 and 50 products"""
+    print("\n=== Testing Excel Export Queries ===")
+
+    app = create_test_app()
+
+    from web_app.database import db
+
+    with app.app_context():
+        uploads = {
+            '5 products': seed_upload(db, date.today() - timedelta(days=1), 5).id,
+            '50 products': seed_upload(db, date.today(), 50).id,
+        }
+
+        client = app.test_client()
+        counts = {}
+        for label, upload_id in uploads.items():
+            db.session.remove()
+            with StatementCounter(db.engine) as counter:
+                response = client.get(f'/comparison/export/{upload_id}')
+            assert response.status_code == 200, f"HTTP {response.status_code}"
+            assert response.data[:2] == b'PK', "Not an xlsx file"
+            counts[label] = counter.count
+            print(f"  {label:12} -> {counter.count} SQL statements")
+
+        db.session.remove()
+
+    assert counts['5 products'] == counts['50 products'], \
+        f"Statement count grows with the number of products (N+1): {counts}"
+
+    print("\n✓ Statement count is constant!")
+
+
+def test_cached_pages():
+    """Repeated page loads are served from the response cache until an upload is written"""
+    print("\n=== Testing Cached Page Queries ===")
+
+    app = create_test_app()
+
+    from web_app.database import db
+    from web_app.utils.response_cache import response_cache
+
+    with app.app_context():
+        upload_id = seed_upload(db, date.today(), 5).id
+
+        client = app.test_client()
+        pages = ['/dashboard', '/comparison/', f'/comparison/date/{date.today().isoformat()}', '/history/']
+        for url in pages:
+            counts = []
+            for _ in range(2):
+                db.session.remove()
+                with StatementCounter(db.engine) as counter:
+                    response = client.get(url)
+                assert response.status_code == 200, f"{url}: HTTP {response.status_code}"
+                counts.append(counter.count)
+            print(f"  {url:28} -> {counts[0]} SQL statements, repeated {counts[1]}")
+            assert counts[1] == 0, f"Repeated {url} was not served from the cache ({counts[1]} SQL statements)"
+
+        response_cache.invalidate(upload_id)
+        db.session.remove()
+        with StatementCounter(db.engine) as counter:
+            client.get('/dashboard')
+        print(f"  after invalidate: /dashboard -> {counter.count} SQL statements")
+        assert counter.count > 0, "Cache not invalidated"
+
+        db.session.remove()
+
+    print("\n✓ Repeated pages are cached!")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print(" SQL Statement Count Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Comparison Page", test_comparison_page),
+        ("Filter Endpoint", test_filter_endpoint),
+        ("Excel Export", test_excel_export),
+        ("Cached Pages", test_cached_pages),
+    ]
+
+    results = []
+    try:
+        for name, test_func in tests:
+            try:
+                test_func()
+                results.append((name, True))
+            except AssertionError as e:
+                print(f"\n✗ {e}")
+                results.append((name, False))
+            except Exception as e:
+                print(f"\n✗ Test '{name}' crashed: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                results.append((name, False))
+    finally:
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    for name, success in results:
+        status = "✓ PASS" if success else "✗ FAIL"
+        print(f"{status:10} {name}")
+
+    passed = sum(1 for _, success in results if success)
+    print(f"\n Result: {passed}/{len(results)} tests passed")
+    return 0 if passed == len(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Test script for query plans of web app service queries
+Every statement a service runs is EXPLAINed against a seeded database; a
+full scan of a table with more than SCAN_ROW_THRESHOLD rows fails the test
+(a missing or unusable index)
+
+Runs on a throwaway SQLite database; set TEST_DATABASE_URL to a scratch
+PostgreSQL database (it is emptied) to check PostgreSQL plans. DATABASE_URL
+is never used - it may point at production.
+
+Usage:
+    python docs/testing/test_query_plans.py
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+COMPETITORS = ['DIM_KAVA', 'ALTA', 'KONTAKT', 'ELITE']
+BRANDS = ['DeLonghi', 'Melitta', 'Nivona']
+
+# Seeded data: UPLOADS days of PRODUCTS products, each priced by every competitor
+UPLOADS = 30
+PRODUCTS = 200
+
+# Full scans of tables up to this many rows are fine (uploads, statistics)
+SCAN_ROW_THRESHOLD = 1000
+
+# Config reads DATABASE_URL once at import - all tests share one database
+TEST_DIR = Path(tempfile.mkdtemp())
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or f"sqlite:///{TEST_DIR / 'plans.db'}"
+os.environ['SECRET_KEY'] = 'test-secret-key'
+
+
+class StatementRecorder:
+    """Record SQL statements (with parameters) executed on an engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def create_test_app():
+    """App on an empty database"""
+    from web_app.app import create_app
+    from web_app.database import db
+
+    app = create_app('production')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed(db):
+    """UPLOADS uploads of PRODUCTS products with competitor prices and price history"""
+    from sqlalchemy import insert
+    from web_app.models import Upload, Product, CompetitorPrice, Statistic, CatalogProduct, PriceObservation
+    from web_app.models.price_observation import OUR_SOURCE
+
+    catalog_ids = db.session.scalars(
+        insert(CatalogProduct).returning(CatalogProduct.id, sort_by_parameter_order=True),
+        [{'model': f'ECAM{i:04d}', 'name': f'DeLonghi ECAM{i:04d}', 'brand': BRANDS[i % 3]} for i in range(PRODUCTS)]
+    ).all()
+
+    for day in range(UPLOADS):
+        upload_date = date.today() - timedelta(days=UPLOADS - 1 - day)
+        upload = Upload(file_name=f'price_comparison_{upload_date}.xlsx', upload_date=upload_date,
+                        total_products=PRODUCTS, status='completed')
+        db.session.add(upload)
+        db.session.flush()
+
+        product_ids = db.session.scalars(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True),
+            [{'upload_id': upload.id, 'model': f'ECAM{i:04d}', 'name': f'DeLonghi ECAM{i:04d}', 'quantity': 1,
+              'our_price': 1000 + i + day, 'brand': BRANDS[i % 3], 'competitor_count': len(COMPETITORS)}
+             for i in range(PRODUCTS)]
+        ).all()
+        db.session.execute(insert(CompetitorPrice), [
+            {'product_id': product_id, 'competitor': competitor, 'price': 990 + i + j, 'regular_price': 990 + i + j,
+             'discount_price': None, 'has_discount': False, 'url': None}
+            for i, product_id in enumerate(product_ids) for j, competitor in enumerate(COMPETITORS)
+        ])
+        db.session.execute(insert(PriceObservation), [
+            {'catalog_product_id': catalog_id, 'date': upload_date, 'source': source, 'price': 990 + i + j,
+             'regular_price': 990 + i + j, 'discount_price': None, 'quantity': 1 if source == OUR_SOURCE else None}
+            for i, catalog_id in enumerate(catalog_ids) for j, source in enumerate([OUR_SOURCE] + COMPETITORS)
+        ])
+        db.session.add(Statistic(upload_id=upload.id, total_value=0, avg_price=0))
+
+    db.session.commit()
+
+    # Planner statistics, as a long-running database has them
+    from sqlalchemy import text
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def service_calls():
+    """(label, call) of every service query path checked"""
+    from web_app.models import Upload
+    from web_app.services import comparison_service, dashboard_service, history_service
+
+    latest = Upload.query.order_by(Upload.upload_date.desc()).first()
+    day = latest.upload_date.isoformat()
+
+    return [
+        ('dashboard', lambda: dashboard_service.get_dashboard_data()),
+        ('latest comparison', lambda: comparison_service.get_latest_comparison()),
+        ('comparison by date', lambda: comparison_service.get_comparison_by_date(day)),
+        ('filter brand + price', lambda: comparison_service.filter_products(
+            latest.id, {'brand': 'Melitta', 'price_from': '1050', 'price_to': '1100'})),
+        ('filter competitor', lambda: comparison_service.filter_products(
+            latest.id, {'competitor': 'ALTA', 'cheaper': True})),
+        ('filter search', lambda: comparison_service.filter_products(latest.id, {'search': 'ECAM00'})),
+        ('excel export', lambda: comparison_service.export_to_excel(latest.id)),
+        ('all uploads', lambda: history_service.get_all_uploads()),
+        ('upload details', lambda: history_service.get_upload_details(latest.id)),
+        ('price trends', lambda: history_service.get_price_trends('ECAM0042')),
+        ('price trends range', lambda: history_service.get_price_trends(
+            'ECAM0042', (latest.upload_date - timedelta(days=7)).isoformat(), day)),
+        ('trend series', lambda: history_service.get_price_trend_series(
+            [f'ECAM{i:04d}' for i in range(0, PRODUCTS, 10)], points=10)),
+    ]
+
+
+def table_rows(db):
+    """Row count of every table"""
+    from sqlalchemy import func, select
+    return {table.name: db.session.execute(select(func.count()).select_from(table)).scalar()
+            for table in db.metadata.sorted_tables}
+
+
+def full_scans(db, statement, parameters, rows):
+    """Tables with more than SCAN_ROW_THRESHOLD rows that the plan of a statement scans fully"""
+    connection = db.session.connection()
+
+    if connection.dialect.name == 'sqlite':
+        # "SCAN products" / "SCAN products USING INDEX ..." read the whole table or index,
+        # "SEARCH products USING INDEX ..." only the matching rows
+        plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        scanned = [re.match(r'SCAN (\w+)', row[-1]) for row in plan]
+    else:
+        plan = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).all()
+        scanned = [re.search(r'Seq Scan on (\w+)', row[0]) for row in plan]
+
+    return sorted({match.group(1) for match in scanned
+                   if match and rows.get(match.group(1), 0) > SCAN_ROW_THRESHOLD})
+
+
+def test_service_query_plans():
+    """No service query scans a large table fully"""
+    print("\n=== Testing Service Query Plans ===")
+
+    app = create_test_app()
+
+    from web_app.database import db
+
+    with app.app_context():
+        seed(db)
+        rows = table_rows(db)
+        print("  Seeded: " + ", ".join(f"{table} {count}" for table, count in rows.items() if count))
+
+        failures = []
+        for label, call in service_calls():
+            db.session.remove()
+            with StatementRecorder(db.engine) as recorder:
+                call()
+
+            scans = set()
+            for statement, parameters in recorder.statements:
+                scans.update(full_scans(db, statement, parameters, rows))
+            print(f"  {label:22} {len(recorder.statements):3} statements"
+                  + (f"  ✗ full scan of {', '.join(sorted(scans))}" if scans else "  ✓"))
+            if scans:
+                failures.append(label)
+
+        db.session.remove()
+
+    assert not failures, f"Full scans of tables over {SCAN_ROW_THRESHOLD} rows: {', '.join(failures)}"
+
+    print("\n✓ All service queries use indexes!")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 60)
+    print(" Query Plan Tests")
+    print("=" * 60)
+
+    tests = [
+        ("Service Query Plans", test_service_query_plans),
+    ]
+
+    results = []
+    try:
+        for name, test_func in tests:
+            try:
+                test_func()
+                results.append((name, True))
+            except AssertionError as e:
+                print(f"\n✗ {e}")
+                results.append((name, False))
+            except Exception as e:
+                print(f"\n✗ Test '{name}' crashed: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                results.append((name, False))
+    finally:
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    for name, success in results:
+        status = "✓ PASS" if success else "✗ FAIL"
+        print(f"{status:10} {name}")
+
+    passed = sum(1 for _, success in results if success)
+    print(f"\n Result: {passed}/{len(results)} tests passed")
+    return 0 if passed == len(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
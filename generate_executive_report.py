@@ -9,6 +9,12 @@ from datetime import datetime
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from utils.output_manifest import COMPARISON_SOURCE, latest_output
+from utils.price_columns import PRICES_SHEET, load_prices
+from utils.price_matrix import PriceMatrix
+
+# Competitors the report compares against (DIM_KAVA is our own website)
+REPORT_COMPETITORS = ['ALTA', 'KONTAKT', 'ELITE']
 
 class ExecutiveReportGenerator:
     """Generate executive report from price comparison data"""
@@ -19,19 +25,30 @@ class ExecutiveReportGenerator:
         
     def find_latest_comparison(self):
         """Find latest price comparison file"""
-        comparison_files = list(self.output_dir.glob('price_comparison_*.xlsx'))
-        if not comparison_files:
-            return None
-        return max(comparison_files, key=lambda x: x.stat().st_mtime)
+        return latest_output(COMPARISON_SOURCE, self.output_dir)
     
     def load_data(self, file_path):
-        """Load comparison data"""
-        df = pd.read_excel(file_path, sheet_name='Price Comparison')
-        stats = pd.read_excel(file_path, sheet_name='Statistics')
-        return df, stats
+        """Load comparison data, statistics and numeric competitor prices"""
+        with pd.ExcelFile(file_path) as xls:
+            df = pd.read_excel(xls, sheet_name='Price Comparison')
+            stats = pd.read_excel(xls, sheet_name='Statistics')
+            prices_sheet = pd.read_excel(xls, sheet_name=PRICES_SHEET) if PRICES_SHEET in xls.sheet_names else None
+        return df, stats, load_prices(df, prices_sheet)
     
-    def analyze_competitiveness(self, df):
-        """Analyze price competitiveness"""
+    def analyze_competitiveness(self, df, prices=None):
+        """
+        Analyze price competitiveness
+        
+        Args:
+            df: 'Price Comparison' sheet
+            prices: Numeric prices from load_prices() (parsed from df if None)
+        """
+        # Our website price and competitor min/max/avg for all rows at once
+        matrix = PriceMatrix.from_comparison(df, prices)
+        website_prices = matrix.column('DIM_KAVA')
+        competitors = matrix.select(REPORT_COMPETITORS)
+        min_prices, max_prices, avg_prices = competitors.min(), competitors.max(), competitors.mean()
+        
         results = {
             'cheaper': [],
             'more_expensive': [],
@@ -40,34 +57,16 @@ class ExecutiveReportGenerator:
             'website_comparison': []  # Compare our cost vs our website price
         }
         
-        for idx, row in df.iterrows():
+        for (idx, row), website_price, min_competitor, max_competitor, avg_competitor in zip(
+            df.iterrows(), website_prices, min_prices, max_prices, avg_prices
+        ):
             our_cost = row['Our Price']  # Our purchase/cost price
             model = row['Model']
             name = row['Product Name']
             qty = row['Quantity']
             
-            # Get our website price (DIM_KAVA)
-            our_website_price = None
-            dimkava_str = row['DIM_KAVA']
-            if dimkava_str != '-':
-                if '\\' in str(dimkava_str):
-                    parts = str(dimkava_str).split('\\')
-                    our_website_price = float(parts[-1].strip())
-                else:
-                    our_website_price = float(dimkava_str)
-            
-            # Get COMPETITOR prices (ALTA, KONTAKT, ELITE only!)
-            competitor_prices = []
-            for col in ['ALTA', 'KONTAKT', 'ELITE']:
-                price_str = row[col]
-                if price_str != '-':
-                    # Parse price (handle "old \ new" format)
-                    if '\\' in str(price_str):
-                        parts = str(price_str).split('\\')
-                        price = float(parts[-1].strip())
-                    else:
-                        price = float(price_str)
-                    competitor_prices.append(price)
+            # Our website price (DIM_KAVA)
+            our_website_price = None if pd.isna(website_price) else float(website_price)
             
             # Analyze our website margin
             if our_website_price:
@@ -84,7 +83,7 @@ class ExecutiveReportGenerator:
                 })
             
             # Analyze against COMPETITORS only (not our website)
-            if not competitor_prices:
+            if pd.isna(min_competitor):
                 results['no_competitors'].append({
                     'model': model,
                     'name': name,
@@ -93,9 +92,9 @@ class ExecutiveReportGenerator:
                     'qty': qty
                 })
             else:
-                min_competitor = min(competitor_prices)
-                max_competitor = max(competitor_prices)
-                avg_competitor = sum(competitor_prices) / len(competitor_prices)
+                min_competitor = float(min_competitor)
+                max_competitor = float(max_competitor)
+                avg_competitor = float(avg_competitor)
                 
                 # Compare our WEBSITE price with competitors (not cost!)
                 if our_website_price:
@@ -365,12 +364,12 @@ class ExecutiveReportGenerator:
         print(f"\nUsing data from: {comparison_file.name}")
         
         # Load data
-        df, stats = self.load_data(comparison_file)
+        df, stats, prices = self.load_data(comparison_file)
         print(f"[OK] Loaded {len(df)} products")
         
         # Analyze
         print("[OK] Analyzing competitiveness...")
-        analysis = self.analyze_competitiveness(df)
+        analysis = self.analyze_competitiveness(df, prices)
         
         print(f"  - Cheaper than competitors: {len(analysis['cheaper'])}")
         print(f"  - More expensive: {len(analysis['more_expensive'])}")
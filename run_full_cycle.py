@@ -8,6 +8,8 @@ import sys
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
+from utils.excel_writer import load_products
+from utils.output_manifest import COMPARISON_SOURCE, latest_entry, latest_output
 
 class FullCycleRunner:
     """Run complete price monitoring cycle"""
@@ -141,22 +143,17 @@ class FullCycleRunner:
         
         output_dir = self.base_dir / 'data' / 'output'
         
-        patterns = {
-            'ALTA': 'alta_*_prices_*.xlsx',
-            'KONTAKT': 'kontakt_*_prices_*.xlsx',
-            'ELITE': 'elite_*_prices_*.xlsx',
-            'DIM_KAVA': 'dimkava_*_prices_*.xlsx',
-        }
-        
         all_found = True
         
-        for source, pattern in patterns.items():
-            files = list(output_dir.glob(pattern))
-            if files:
-                latest = max(files, key=lambda x: x.stat().st_mtime)
-                df = pd.read_excel(latest)
-                print(f"  [OK] {source:10s}: {len(df):3d} products in {latest.name}")
-                self.results[f'{source}_products'] = len(df)
+        for source in ('ALTA', 'KONTAKT', 'ELITE', 'DIM_KAVA'):
+            entry = latest_entry(source, output_dir)
+            if entry:
+                # Row count comes from the manifest; only legacy files are opened
+                count = entry['row_count']
+                if count is None:
+                    count = len(load_products(entry['path']))
+                print(f"  [OK] {source:10s}: {count:3d} products in {entry['path'].name}")
+                self.results[f'{source}_products'] = count
             else:
                 print(f"  [ERROR] {source:10s}: No data files found")
                 all_found = False
@@ -205,14 +202,12 @@ class FullCycleRunner:
         
         # Find latest comparison file
         output_dir = self.base_dir / 'data' / 'output'
-        comparison_files = list(output_dir.glob('price_comparison_*.xlsx'))
+        latest_file = latest_output(COMPARISON_SOURCE, output_dir)
         
-        if not comparison_files:
+        if latest_file is None:
             print("[ERROR] No comparison file found")
             return False
         
-        latest_file = max(comparison_files, key=lambda x: x.stat().st_mtime)
-        
         print(f"\nComparison file: {latest_file.name}")
         print("-"*80)
         
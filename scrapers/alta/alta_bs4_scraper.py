@@ -22,7 +22,7 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from config import ALTA_CONFIG, SELENIUM_CONFIG
 from utils.logger import setup_logger
-from utils.excel_writer import save_to_excel, save_to_csv
+from utils.excel_writer import save_products, save_to_csv
 
 
 logger = setup_logger("alta_bs4_scraper")
@@ -236,8 +236,8 @@ class AltaBS4Scraper:
         logger.info("Saving results...")
         
         try:
-            excel_path = save_to_excel(self.products, filename=f"alta_bs4_prices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
-            logger.info(f"[OK] Saved to Excel: {excel_path}")
+            products_path = save_products(self.products, f"alta_bs4_prices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet", 'ALTA')
+            logger.info(f"[OK] Saved to Parquet: {products_path}")
             
             csv_path = save_to_csv(self.products, filename=f"alta_bs4_prices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
             logger.info(f"[OK] Saved to CSV: {csv_path}")
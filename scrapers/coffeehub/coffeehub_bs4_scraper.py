@@ -18,7 +18,7 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from config import COFFEEHUB_CONFIG, SELENIUM_CONFIG
 from utils.logger import setup_logger
-from utils.excel_writer import save_to_excel, save_to_csv
+from utils.excel_writer import save_products, save_to_csv
 
 
 logger = setup_logger("coffeehub_bs4_scraper")
@@ -243,10 +243,9 @@ class CoffeeHubBS4Scraper:
         
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        # Save to Excel
-        excel_path = Path(__file__).parent.parent.parent / 'data' / 'output' / f'coffeehub_prices_{timestamp}.xlsx'
-        save_to_excel(self.products, excel_path)
-        logger.info(f"[OK] Saved to Excel: {excel_path}")
+        # Save product file (Parquet) for the comparison builder
+        products_path = save_products(self.products, f'coffeehub_prices_{timestamp}.parquet', 'COFFEEHUB')
+        logger.info(f"[OK] Saved to Parquet: {products_path}")
         
         # Save to CSV
         csv_path = Path(__file__).parent.parent.parent / 'data' / 'output' / f'coffeehub_prices_{timestamp}.csv'
@@ -18,7 +18,7 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from config import DIMKAVA_CONFIG, SELENIUM_CONFIG
 from utils.logger import setup_logger
-from utils.excel_writer import save_to_excel, save_to_csv
+from utils.excel_writer import save_products, save_to_csv
 
 
 logger = setup_logger("dimkava_bs4_scraper")
@@ -221,8 +221,8 @@ class DimKavaBS4Scraper:
         
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            excel_path = save_to_excel(self.products, filename=f"dimkava_delonghi_prices_{timestamp}.xlsx")
-            logger.info(f"[OK] Saved to Excel: {excel_path}")
+            products_path = save_products(self.products, f"dimkava_delonghi_prices_{timestamp}.parquet", 'DIM_KAVA')
+            logger.info(f"[OK] Saved to Parquet: {products_path}")
             
             csv_path = save_to_csv(self.products, filename=f"dimkava_delonghi_prices_{timestamp}.csv")
             logger.info(f"[OK] Saved to CSV: {csv_path}")
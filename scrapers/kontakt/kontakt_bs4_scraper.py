@@ -22,7 +22,7 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from config import KONTAKT_CONFIG, SELENIUM_CONFIG
 from utils.logger import setup_logger
-from utils.excel_writer import save_to_excel, save_to_csv
+from utils.excel_writer import save_products, save_to_csv
 
 
 logger = setup_logger("kontakt_bs4_scraper")
@@ -261,8 +261,8 @@ class KontaktBS4Scraper:
         
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            excel_path = save_to_excel(self.products, filename=f"kontakt_bs4_prices_{timestamp}.xlsx")
-            logger.info(f"[OK] Saved to Excel: {excel_path}")
+            products_path = save_products(self.products, f"kontakt_bs4_prices_{timestamp}.parquet", 'KONTAKT')
+            logger.info(f"[OK] Saved to Parquet: {products_path}")
             
             csv_path = save_to_csv(self.products, filename=f"kontakt_bs4_prices_{timestamp}.csv")
             logger.info(f"[OK] Saved to CSV: {csv_path}")
@@ -26,6 +26,7 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 
 from config import VEGA_GE_CONFIG, SELENIUM_CONFIG
+from utils.excel_writer import save_products
 
 # Setup logging
 logging.basicConfig(
@@ -305,8 +306,8 @@ class VegaGeScraper:
         logger.info(f"Total unique products scraped: {len(self.products)}")
         return self.products
     
-    def save_to_excel(self, products):
-        """Save products to Excel file"""
+    def save_results(self, products):
+        """Save products to Parquet (builder input) and CSV"""
         if not products:
             logger.warning("No products to save")
             return
@@ -317,16 +318,14 @@ class VegaGeScraper:
         
         # Generate filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"vega_ge_prices_{timestamp}.xlsx"
-        filepath = output_dir / filename
+        
+        # Save product file (Parquet) for the comparison builder
+        filepath = save_products(products, f"vega_ge_prices_{timestamp}.parquet", 'VEGA_GE')
+        logger.info(f"[OK] Saved to Parquet: {filepath}")
         
         # Create DataFrame
         df = pd.DataFrame(products)
         
-        # Save to Excel
-        df.to_excel(filepath, index=False)
-        logger.info(f"[OK] Saved to Excel: {filepath}")
-        
         # Also save to CSV
         csv_filename = f"vega_ge_prices_{timestamp}.csv"
         csv_filepath = output_dir / csv_filename
@@ -348,7 +347,7 @@ class VegaGeScraper:
             
             if products:
                 # Save results
-                self.save_to_excel(products)
+                self.save_results(products)
                 logger.info(f"SUCCESS! Scraped {len(products)} products from {len(self.config['urls'])} URLs")
             else:
                 logger.warning("No products found")
@@ -0,0 +1,201 @@
+"""
+Batch model matcher - inventory × competitor similarity matrix
+Scores all pairs in one vectorized pass and picks one-to-one matches
+"""
+
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.model_extractor import ModelExtractor
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # difflib fallback (slow, similar scores)
+    fuzz = process = None
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+except ImportError:  # Greedy assignment fallback below
+    linear_sum_assignment = None
+
+
+class BatchMatcher:
+    """
+    Match many normalized models against many others at once
+
+    Pairs only score if they share a base model (color suffix stripped),
+    so EC9255 ↔ EC9255M and ECAM22114B ↔ ECAM22114SB can match while
+    EC9255 ↔ EC9155 never does. Within a base model the score blends model
+    similarity with product name similarity to pick the closest variant.
+    """
+
+    # Rows scored per cdist call - bounds temporary memory on 10k × 10k runs
+    CHUNK_ROWS = 2048
+
+    def __init__(self, min_score: int = 80, model_weight: float = 0.8, workers: int = -1):
+        """
+        Args:
+            min_score: Minimum combined score (0-100) to accept a pair
+            model_weight: Share of the model score in the combined score
+            workers: rapidfuzz worker threads (-1 = all cores)
+        """
+        self.min_score = min_score
+        self.model_weight = model_weight
+        self.workers = workers
+
+    def score_matrix(
+        self,
+        left_models: Sequence[str],
+        right_models: Sequence[str],
+        left_names: Optional[Sequence[str]] = None,
+        right_names: Optional[Sequence[str]] = None,
+    ) -> np.ndarray:
+        """
+        Build the full left × right similarity matrix
+
+        Args:
+            left_models: Normalized models (e.g. inventory)
+            right_models: Normalized models (e.g. scraped products)
+            left_names: Optional product names for left side
+            right_names: Optional product names for right side
+
+        Returns:
+            uint8 matrix of combined scores 0-100 (0 where base models differ)
+        """
+        scores = np.zeros((len(left_models), len(right_models)), dtype=np.uint8)
+        if scores.size == 0:
+            return scores
+
+        left_models, right_models = list(left_models), list(right_models)
+        left_codes, right_codes = self._base_codes(left_models, right_models)
+        use_names = left_names is not None and right_names is not None
+        if use_names:
+            left_names = [str(n) for n in left_names]
+            right_names = [str(n) for n in right_names]
+
+        for start in range(0, len(left_models), self.CHUNK_ROWS):
+            stop = min(start + self.CHUNK_ROWS, len(left_models))
+
+            model_scores = self._cdist(left_models[start:stop], right_models)
+            same_base = (left_codes[start:stop, None] == right_codes[None, :]) & (left_codes[start:stop, None] >= 0)
+            rows, cols = np.nonzero(same_base)
+            combined = model_scores[rows, cols].astype(np.float32)
+
+            # Names only break ties between variants of one base model, so
+            # they are scored for same-base pairs instead of the full matrix
+            if use_names and len(rows):
+                name_scores = np.array(
+                    [self._name_score(left_names[start + r], right_names[c]) for r, c in zip(rows, cols)],
+                    dtype=np.float32,
+                )
+                combined = self.model_weight * combined + (1 - self.model_weight) * name_scores
+
+            scores[start + rows, cols] = np.rint(combined).astype(np.uint8)
+
+        return scores
+
+    def assign(self, scores: np.ndarray) -> List[Tuple[int, int, int]]:
+        """
+        Pick one-to-one pairs maximizing the total score
+
+        Args:
+            scores: Matrix from score_matrix()
+
+        Returns:
+            List of (left_index, right_index, score), each index used at most once
+        """
+        candidates = scores >= self.min_score
+        if not candidates.any():
+            return []
+
+        if linear_sum_assignment is None:
+            return self._assign_greedy(scores, candidates)
+
+        # Solve each connected block of candidate pairs separately -
+        # blocks are tiny (color variants of one base model), so the
+        # assignment stays cheap even when the matrix is 10k × 10k
+        rows, cols = np.nonzero(candidates)
+        n_left = scores.shape[0]
+        graph = coo_matrix(
+            (np.ones(len(rows), dtype=np.int8), (rows, cols + n_left)),
+            shape=(n_left + scores.shape[1],) * 2,
+        )
+        _, labels = connected_components(graph, directed=False)
+
+        blocks: Dict[int, Tuple[set, set]] = {}
+        for r, c in zip(rows, cols):
+            block_rows, block_cols = blocks.setdefault(labels[r], (set(), set()))
+            block_rows.add(r)
+            block_cols.add(c)
+
+        pairs = []
+        for block_rows, block_cols in blocks.values():
+            block_rows, block_cols = sorted(block_rows), sorted(block_cols)
+            block = scores[np.ix_(block_rows, block_cols)]
+            for i, j in zip(*linear_sum_assignment(block, maximize=True)):
+                if block[i, j] >= self.min_score:
+                    pairs.append((block_rows[i], block_cols[j], int(block[i, j])))
+
+        return sorted(pairs)
+
+    def match(
+        self,
+        left_models: Sequence[str],
+        right_models: Sequence[str],
+        left_names: Optional[Sequence[str]] = None,
+        right_names: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[int, int, int]]:
+        """Score all pairs and return one-to-one matches (see assign())"""
+        return self.assign(self.score_matrix(left_models, right_models, left_names, right_names))
+
+    def _cdist(self, queries: Sequence[str], choices: Sequence[str]) -> np.ndarray:
+        """Pairwise model similarity 0-100 using rapidfuzz, or difflib if unavailable"""
+        if process is not None:
+            return process.cdist(queries, choices, scorer=fuzz.ratio, dtype=np.uint8, workers=self.workers)
+
+        return np.array(
+            [[round(SequenceMatcher(None, q, c).ratio() * 100) for c in choices] for q in queries],
+            dtype=np.uint8,
+        ).reshape(len(queries), len(choices))
+
+    @staticmethod
+    def _name_score(left: str, right: str) -> float:
+        """Word-order-insensitive product name similarity 0-100"""
+        if fuzz is not None:
+            return fuzz.token_set_ratio(left, right)
+
+        left, right = (' '.join(sorted(set(n.lower().split()))) for n in (left, right))
+        return SequenceMatcher(None, left, right).ratio() * 100
+
+    @staticmethod
+    def _base_codes(left_models: Sequence[str], right_models: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Map base models on both sides to shared integer codes (-1 = no usable base)"""
+        codes: Dict[str, int] = {}
+
+        def encode(models: Sequence[str]) -> np.ndarray:
+            out = np.empty(len(models), dtype=np.int64)
+            for i, model in enumerate(models):
+                base = ModelExtractor.base_model(model)
+                out[i] = codes.setdefault(base, len(codes)) if base else -1
+            return out
+
+        return encode(left_models), encode(right_models)
+
+    def _assign_greedy(self, scores: np.ndarray, candidates: np.ndarray) -> List[Tuple[int, int, int]]:
+        """Highest-score-first assignment when scipy is not installed"""
+        rows, cols = np.nonzero(candidates)
+        order = np.argsort(-scores[rows, cols].astype(np.int16), kind='stable')
+
+        used_rows, used_cols, pairs = set(), set(), []
+        for k in order:
+            r, c = int(rows[k]), int(cols[k])
+            if r not in used_rows and c not in used_cols:
+                used_rows.add(r)
+                used_cols.add(c)
+                pairs.append((r, c, int(scores[r, c])))
+
+        return sorted(pairs)
@@ -1,11 +1,151 @@
 """
 Excel writer utility
+Also writes/reads the Parquet product files passed between pipeline stages
 """
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 from config import OUTPUT_DIR, OUTPUT_CONFIG
+from utils.output_manifest import record_output
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Product files fall back to xlsx without pyarrow
+    pa = pq = None
+
+# Fixed schema of scraped product files (one row per listing)
+# price is the price a customer pays (discounted if on sale)
+PRODUCT_COLUMNS = [
+    'name', 'price', 'regular_price', 'discount_price', 'has_discount', 'url', 'source', 'scraped_at',
+]
+
+if pa is not None:
+    PRODUCT_SCHEMA = pa.schema([
+        ('name', pa.string()),
+        ('price', pa.float64()),
+        ('regular_price', pa.float64()),
+        ('discount_price', pa.float64()),
+        ('has_discount', pa.bool_()),
+        ('url', pa.string()),
+        ('source', pa.string()),
+        ('scraped_at', pa.string()),
+    ])
+
+
+def normalize_products(df: pd.DataFrame, source: Optional[str] = None) -> pd.DataFrame:
+    """
+    Convert any scraper output format to the fixed product schema
+    
+    ALTA/KONTAKT/ELITE/DIM_KAVA rows carry final_price/regular_price/discount_price.
+    The other scrapers carry price (+ discount_price), COFFEEPIN/VEGA_GE/
+    VELI_STORE also regular_price and has_discount. Where those are missing
+    (COFFEEHUB) the regular price is taken as price and a listing is
+    discounted when discount_price differs from it.
+    
+    Args:
+        df: Raw scraped data
+        source: Source name (overrides the source column if given)
+        
+    Returns:
+        DataFrame with PRODUCT_COLUMNS
+    """
+    def column(name):
+        if name in df.columns:
+            return pd.to_numeric(df[name], errors='coerce').astype(float)
+        return pd.Series(float('nan'), index=df.index)
+    
+    discount_price = column('discount_price')
+    if 'final_price' in df.columns:
+        price = column('final_price')
+        regular_price = column('regular_price')
+        has_discount = pd.Series(False, index=df.index)
+        if 'has_discount' in df.columns:
+            has_discount = df['has_discount'].fillna(False).astype(bool)
+    else:
+        price = column('price')
+        regular_price = column('regular_price').fillna(price)
+        if 'has_discount' in df.columns:
+            has_discount = df['has_discount'].fillna(False).astype(bool)
+        else:
+            has_discount = discount_price.notna() & (discount_price != price)
+    
+    def text(name):
+        if name not in df.columns:
+            return pd.Series(None, index=df.index, dtype=object)
+        return df[name].astype(str).where(df[name].notna(), None)
+    
+    result = pd.DataFrame({
+        'name': text('name'),
+        'price': price,
+        'regular_price': regular_price,
+        'discount_price': discount_price,
+        'has_discount': has_discount,
+        'url': text('url'),
+        'source': source if source else text('source'),
+        'scraped_at': text('scraped_at'),
+    }, columns=PRODUCT_COLUMNS)
+    
+    return result.reset_index(drop=True)
+
+
+def save_products(data: List[Dict], filename: str, source: str) -> Path:
+    """
+    Save scraped products as the pipeline interchange file
+    
+    Writes Parquet with PRODUCT_SCHEMA (xlsx if pyarrow is not installed)
+    and records the file in the output manifest.
+    
+    Args:
+        data: List of dictionaries with product data
+        filename: File name, e.g. alta_bs4_prices_20251027_120000.parquet
+        source: Source name (ALTA, KONTAKT, ...)
+        
+    Returns:
+        Path to the saved file
+    """
+    if not data:
+        raise ValueError("No data to save")
+    
+    df = normalize_products(pd.DataFrame(data), source)
+    filepath = OUTPUT_DIR / filename
+    
+    if pq is not None:
+        filepath = filepath.with_suffix('.parquet')
+        table = pa.Table.from_pandas(df, schema=PRODUCT_SCHEMA, preserve_index=False)
+        pq.write_table(table, filepath)
+    else:
+        filepath = filepath.with_suffix('.xlsx')
+        df.to_excel(filepath, index=False, engine='openpyxl')
+    
+    record_output(source, filepath, row_count=len(df))
+    
+    return filepath
+
+
+def load_products(filepath: Path, source: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load a scraped product file (Parquet, or legacy xlsx/csv) in the fixed schema
+    
+    Args:
+        filepath: Product file
+        source: Source name to set on every row
+        
+    Returns:
+        DataFrame with PRODUCT_COLUMNS
+    """
+    filepath = Path(filepath)
+    if filepath.suffix == '.parquet':
+        df = pd.read_parquet(filepath, columns=PRODUCT_COLUMNS)
+        if source:
+            df['source'] = source
+        return df
+    
+    if filepath.suffix == '.csv':
+        return normalize_products(pd.read_csv(filepath), source)
+    
+    return normalize_products(pd.read_excel(filepath), source)
 
 
 def save_to_excel(data: List[Dict], filename: str = None) -> Path:
@@ -0,0 +1,212 @@
+"""
+Inventory loader for the 1C stock export (остатки.xls)
+Detects the column layout once, extracts name/quantity/price with vectorized
+column operations and caches the parsed result as a Parquet sidecar
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Cache disabled without pyarrow - always parse the xls
+    pa = pq = None
+
+# Brands we track (anything else in the export is ignored)
+BRANDS = ('delonghi', 'melitta', 'nivona')
+
+# Header labels of the 1C export (lowercase, matched as substrings)
+HEADER_LABELS = {
+    'name': 'наименование',
+    'quantity': 'кол-во',
+    'price': 'цена',
+}
+
+# Rows searched for the header before falling back to the legacy parser
+HEADER_SEARCH_ROWS = 50
+
+# Bump when parsing rules change so old sidecars are ignored
+CACHE_VERSION = 1
+CACHE_METADATA_KEY = b'inventory_cache'
+
+COLUMNS = ['name', 'quantity', 'price', 'source']
+
+
+def load_inventory(file_path: Path, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load inventory products from 1C export
+
+    Args:
+        file_path: Path to остатки.xls
+        use_cache: Read/write the Parquet sidecar (остатки.xls.parquet)
+
+    Returns:
+        DataFrame with name, quantity, price, source columns
+    """
+    file_path = Path(file_path)
+    cache_path = file_path.with_name(file_path.name + '.parquet')
+
+    stat = file_path.stat()
+    key = {'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    if use_cache and pq is not None:
+        cached = _read_cache(cache_path, key, file_path)
+        if cached is not None:
+            return cached
+
+    df = parse_inventory(pd.read_excel(file_path, header=None))
+
+    if use_cache and pq is not None:
+        key['sha256'] = _file_hash(file_path)
+        _write_cache(cache_path, df, key)
+
+    return df
+
+
+def parse_inventory(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Extract tracked-brand products from raw export sheet (read with header=None)
+
+    Args:
+        raw: Raw sheet
+
+    Returns:
+        DataFrame with name, quantity, price, source columns
+    """
+    layout = detect_layout(raw)
+    if layout is None:
+        return _parse_rows_legacy(raw)
+
+    names = raw[layout['name']].where(raw[layout['name']].notna()).astype('string').str.strip()
+    qty = pd.to_numeric(raw[layout['quantity']], errors='coerce')
+    price = pd.to_numeric(raw[layout['price']], errors='coerce')
+
+    mask = (
+        names.str.lower().str.contains('|'.join(BRANDS), na=False)
+        & (qty > 0)
+        & (price > 0)
+    )
+
+    return pd.DataFrame({
+        'name': names[mask].astype(str),
+        'quantity': qty[mask].astype(int),
+        'price': price[mask].astype(float),
+        'source': 'INVENTORY',
+    }, columns=COLUMNS).reset_index(drop=True)
+
+
+def detect_layout(raw: pd.DataFrame) -> Optional[Dict[str, int]]:
+    """
+    Find name/quantity/price columns from the header row
+
+    Args:
+        raw: Raw sheet (header=None)
+
+    Returns:
+        {'name': col, 'quantity': col, 'price': col} or None if no header found
+    """
+    for _, row in raw.head(HEADER_SEARCH_ROWS).iterrows():
+        layout = {}
+        for col, value in row.items():
+            if not isinstance(value, str):
+                continue
+            label = value.strip().lower()
+            for field, pattern in HEADER_LABELS.items():
+                if field not in layout and pattern in label:
+                    layout[field] = col
+                    break
+
+        if len(layout) == len(HEADER_LABELS):
+            return layout
+
+    return None
+
+
+def _parse_rows_legacy(raw: pd.DataFrame) -> pd.DataFrame:
+    """Row-by-row parser for exports without a recognizable header row"""
+    products = []
+    for i in range(len(raw)):
+        row_values = [v for v in raw.iloc[i].values if pd.notna(v)]
+
+        name = qty = price = None
+        if len(row_values) == 5:
+            name, qty, price = str(row_values[1]), row_values[2], row_values[3]
+        elif len(row_values) == 6:
+            name, qty, price = str(row_values[1]), row_values[3], row_values[4]
+        elif len(row_values) == 7:
+            name, qty, price = str(row_values[1]), row_values[4], row_values[5]
+
+        if name and any(brand in name.lower() for brand in BRANDS):
+            if isinstance(qty, (int, float)) and isinstance(price, (int, float)):
+                if qty > 0 and price > 0:
+                    products.append({
+                        'name': name,
+                        'quantity': int(qty),
+                        'price': float(price),
+                        'source': 'INVENTORY'
+                    })
+
+    return pd.DataFrame(products, columns=COLUMNS)
+
+
+def _file_hash(file_path: Path) -> str:
+    """SHA-256 of file content"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_cache(cache_path: Path, key: Dict, file_path: Path) -> Optional[pd.DataFrame]:
+    """
+    Return cached inventory if the sidecar matches the source file
+
+    Same size + mtime is trusted as-is. If only mtime changed (file copied or
+    re-saved), the content hash decides and the sidecar key is refreshed.
+    """
+    if not cache_path.exists():
+        return None
+
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+        cached_key = json.loads(metadata.get(CACHE_METADATA_KEY, b'{}'))
+        if cached_key.get('version') != key['version'] or cached_key.get('size') != key['size']:
+            return None
+
+        df = pq.read_table(cache_path).to_pandas()
+        if cached_key.get('mtime_ns') == key['mtime_ns']:
+            return df
+
+        sha256 = _file_hash(file_path)
+        if cached_key.get('sha256') == sha256:
+            _write_cache(cache_path, df, {**key, 'sha256': sha256})
+            return df
+    except Exception:
+        # Corrupt or foreign sidecar - reparse
+        pass
+
+    return None
+
+
+def _write_cache(cache_path: Path, df: pd.DataFrame, key: Dict):
+    """Atomically write Parquet sidecar with cache key in schema metadata"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[CACHE_METADATA_KEY] = json.dumps(key).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Read-only inbox etc. - caching is best effort
+        if tmp_path.exists():
+            tmp_path.unlink()
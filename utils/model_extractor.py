@@ -233,15 +233,35 @@ class ModelExtractor:
         
         # If not strict, allow base model matching (ignore color suffix)
         if not strict:
-            # Remove last 1-2 characters if they are letters (color codes)
-            # EC685R → EC685, EC685BG → EC685
-            m1_base = re.sub(r'[A-Z]{1,2}$', '', m1_norm)
-            m2_base = re.sub(r'[A-Z]{1,2}$', '', m2_norm)
-            
-            if m1_base == m2_base and len(m1_base) >= 4:
+            m1_base = cls.base_model(m1_norm)
+
+            if m1_base and m1_base == cls.base_model(m2_norm):
                 return True
-        
+
         return False
+
+    @classmethod
+    def base_model(cls, normalized: str) -> str:
+        """
+        Strip color suffix from a normalized model
+
+        Args:
+            normalized: Model normalized with normalize_for_matching()
+
+        Returns:
+            Base model, or empty string if too short to be reliable
+
+        Examples:
+            >>> ModelExtractor.base_model("EC685BG")
+            'EC685'
+            >>> ModelExtractor.base_model("ECAM22114SB")
+            'ECAM22114'
+        """
+        # Remove last 1-2 characters if they are letters (color codes)
+        # EC685R → EC685, EC685BG → EC685
+        base = re.sub(r'[A-Z]{1,2}$', '', normalized or '')
+
+        return base if len(base) >= 4 else ''
     
     @classmethod
     def get_model_variants(cls, model: str) -> List[str]:
@@ -0,0 +1,171 @@
+"""
+Output manifest - index of the latest file per source in data/output
+Scrapers and the builder record every file they write; consumers look up
+the latest file per source instead of globbing and stat-ing the directory
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_OUTPUT_DIR = Path(__file__).parent.parent / 'data' / 'output'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Builder output
+COMPARISON_SOURCE = 'PRICE_COMPARISON'
+
+# Glob patterns for files written before the manifest existed
+# (scrapers: Parquet product files, older runs xlsx)
+SCRAPER_PATTERNS = {
+    source: (f'{stem}.parquet', f'{stem}.xlsx')
+    for source, stem in {
+        'ALTA': 'alta_*_prices_*',
+        'KONTAKT': 'kontakt_*_prices_*',
+        'ELITE': 'elite_*_prices_*',
+        'DIM_KAVA': 'dimkava_*_prices_*',
+        'COFFEEHUB': 'coffeehub_prices_*',
+        'COFFEEPIN': 'coffeepin_prices_*',
+        'VELI_STORE': 'veli_store_prices_*',
+        'VEGA_GE': 'vega_ge_prices_*',
+    }.items()
+}
+SOURCE_PATTERNS = {**SCRAPER_PATTERNS, COMPARISON_SOURCE: ('price_comparison_*.xlsx',)}
+
+# Scrapers run in parallel (or two run_full_cycle's overlap) - a lock older
+# than this is left over from a killed process and is taken over
+LOCK_TIMEOUT = 10
+LOCK_STALE_AFTER = 60
+
+
+def record_output(source: str, path: Path, row_count: Optional[int] = None) -> Dict:
+    """
+    Record a freshly written file as the latest output of a source
+
+    Args:
+        source: Source name (ALTA, KONTAKT, ..., PRICE_COMPARISON)
+        path: Written file (manifest lives next to it)
+        row_count: Number of data rows in the file
+
+    Returns:
+        Manifest entry {source, path, row_count, sha256, size, created_at}
+    """
+    path = Path(path)
+    entry = {
+        'source': source,
+        'path': path.name,
+        'row_count': row_count,
+        'sha256': _file_hash(path),
+        'size': path.stat().st_size,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+    manifest_path = path.parent / MANIFEST_NAME
+    with _ManifestLock(manifest_path):
+        manifest = read_manifest(path.parent)
+        manifest['sources'][source] = entry
+        _write_manifest(manifest_path, manifest)
+
+    return entry
+
+
+def read_manifest(output_dir: Optional[Path] = None) -> Dict:
+    """
+    Read the manifest of an output directory
+
+    Returns:
+        {'version': 1, 'sources': {source: entry}} (empty if missing or unreadable)
+    """
+    manifest_path = Path(output_dir or DEFAULT_OUTPUT_DIR) / MANIFEST_NAME
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION and isinstance(manifest.get('sources'), dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+
+    return {'version': MANIFEST_VERSION, 'sources': {}}
+
+
+def latest_entry(source: str, output_dir: Optional[Path] = None) -> Optional[Dict]:
+    """
+    Latest manifest entry of a source, with 'path' resolved to a full Path
+
+    Falls back to the newest file matching SOURCE_PATTERNS when the source
+    has no entry yet or its file was removed (row_count/sha256 are then None).
+    """
+    output_dir = Path(output_dir or DEFAULT_OUTPUT_DIR)
+
+    entry = read_manifest(output_dir)['sources'].get(source)
+    if entry:
+        path = output_dir / entry['path']
+        if path.exists():
+            return {**entry, 'path': path}
+
+    files = [f for pattern in SOURCE_PATTERNS.get(source, ()) for f in output_dir.glob(pattern)]
+    if not files:
+        return None
+
+    path = max(files, key=lambda x: x.stat().st_mtime)
+    return {'source': source, 'path': path, 'row_count': None, 'sha256': None,
+            'size': path.stat().st_size, 'created_at': None}
+
+
+def latest_output(source: str, output_dir: Optional[Path] = None) -> Optional[Path]:
+    """Path of the latest file of a source, or None"""
+    entry = latest_entry(source, output_dir)
+    return entry['path'] if entry else None
+
+
+def _file_hash(path: Path) -> str:
+    """SHA-256 of file content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_manifest(manifest_path: Path, manifest: Dict):
+    """Write manifest to a temp file and atomically replace the old one"""
+    tmp_path = manifest_path.with_name(f'{manifest_path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+
+class _ManifestLock:
+    """Cross-platform exclusive lock (lock file created with O_EXCL)"""
+
+    def __init__(self, manifest_path: Path):
+        self.lock_path = manifest_path.with_name(manifest_path.name + '.lock')
+
+    def __enter__(self):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - self.lock_path.stat().st_mtime > LOCK_STALE_AFTER:
+                        self.lock_path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Manifest is locked: {self.lock_path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            self.lock_path.unlink()
+        except FileNotFoundError:
+            pass
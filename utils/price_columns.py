@@ -0,0 +1,122 @@
+"""
+Numeric price columns of the comparison workbook
+'Price Comparison' shows competitor prices as "regular \\ discount" strings for
+people; the 'Prices' sheet carries the same prices as numbers, one row per
+'Price Comparison' row, with <SOURCE>_regular/_discount/_final columns
+
+Also imported by the web app (the Docker image copies it, see Dockerfile)
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Competitor columns in workbook order - DIM_KAVA (our website) first
+SOURCES = ['DIM_KAVA', 'ALTA', 'KONTAKT', 'ELITE', 'COFFEEHUB', 'COFFEEPIN', 'VELI_STORE', 'VEGA_GE']
+
+# Other shops - every source except our website
+COMPETITORS = SOURCES[1:]
+
+PRICES_SHEET = 'Prices'
+PRICE_FIELDS = ('regular', 'discount', 'final')
+
+
+def price_column(source: str, field: str) -> str:
+    """Column name of one price field, e.g. ALTA_final"""
+    return f'{source}_{field}'
+
+
+def price_columns(sources: Sequence[str] = SOURCES) -> List[str]:
+    """All numeric price columns for the given sources, in sheet order"""
+    return [price_column(source, field) for source in sources for field in PRICE_FIELDS]
+
+
+def format_display_prices(prices: pd.DataFrame, sources: Sequence[str] = SOURCES) -> pd.DataFrame:
+    """
+    Render numeric prices as 'Price Comparison' cells
+
+    Args:
+        prices: Frame with <SOURCE>_regular/_discount/_final columns
+        sources: Competitor columns to render
+
+    Returns:
+        Frame with one column per source: "150.00 \\ 120.00", "150.00" or '-'
+    """
+    display = pd.DataFrame(index=prices.index)
+    for source in sources:
+        regular = prices[price_column(source, 'regular')]
+        discount = prices[price_column(source, 'discount')]
+        final = prices[price_column(source, 'final')]
+
+        cells = pd.Series('-', index=prices.index, dtype=object)
+        single = final.notna() & discount.isna()
+        if single.any():
+            cells[single] = final[single].map('{:.2f}'.format)
+        on_sale = discount.notna() & regular.notna()
+        if on_sale.any():
+            cells[on_sale] = regular[on_sale].map('{:.2f}'.format) + ' \\ ' + discount[on_sale].map('{:.2f}'.format)
+        display[source] = cells
+
+    return display
+
+
+def split_display_prices(comparison: pd.DataFrame, sources: Sequence[str] = SOURCES) -> pd.DataFrame:
+    """
+    Parse "regular \\ discount" cells of a 'Price Comparison' sheet (workbooks
+    written before the 'Prices' sheet existed)
+
+    Args:
+        comparison: 'Price Comparison' sheet
+        sources: Competitor columns to parse (missing columns give NaN)
+
+    Returns:
+        Frame with <SOURCE>_regular/_discount/_final columns, index of comparison
+    """
+    prices = pd.DataFrame(index=comparison.index)
+    for source in sources:
+        if source in comparison.columns:
+            parts = comparison[source].astype(str).str.split('\\', n=1, expand=True)
+            regular = pd.to_numeric(parts[0].str.strip(), errors='coerce')
+            if parts.shape[1] > 1:
+                discount = pd.to_numeric(parts[1].str.strip(), errors='coerce')
+            else:
+                discount = pd.Series(np.nan, index=comparison.index)
+        else:
+            regular = discount = pd.Series(np.nan, index=comparison.index)
+
+        prices[price_column(source, 'regular')] = regular
+        prices[price_column(source, 'discount')] = discount
+        prices[price_column(source, 'final')] = discount.fillna(regular)
+
+    return prices
+
+
+def load_prices(comparison: pd.DataFrame, prices: Optional[pd.DataFrame] = None,
+                sources: Sequence[str] = SOURCES) -> pd.DataFrame:
+    """
+    Numeric competitor prices for a 'Price Comparison' sheet
+
+    Uses the 'Prices' sheet when it is present and row-aligned with the
+    comparison, otherwise parses the display strings.
+
+    Args:
+        comparison: 'Price Comparison' sheet
+        prices: 'Prices' sheet, if the workbook has one
+        sources: Competitors to return
+
+    Returns:
+        Float frame with <SOURCE>_regular/_discount/_final columns, index of comparison
+    """
+    if prices is not None and len(prices) == len(comparison):
+        aligned = 'Model' not in prices.columns or 'Model' not in comparison.columns or (
+            prices['Model'].astype(str).to_numpy() == comparison['Model'].astype(str).to_numpy()
+        ).all()
+        if aligned:
+            result = pd.DataFrame(index=comparison.index)
+            for column in price_columns(sources):
+                values = prices[column].to_numpy() if column in prices.columns else np.nan
+                result[column] = pd.to_numeric(pd.Series(values, index=comparison.index), errors='coerce')
+            return result
+
+    return split_display_prices(comparison, sources)
@@ -0,0 +1,230 @@
+"""
+Price matrix - products × sources competitor prices as dense NumPy arrays
+One row per product, one column per source, NaN where a source has no price.
+Competitive analytics (min/max/avg competitor, cheaper/more expensive flags,
+coverage, gaps) are column operations over the whole matrix.
+
+Also imported by the web app (the Docker image copies it, see Dockerfile)
+"""
+
+import warnings
+from functools import cached_property
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.price_columns import SOURCES, load_prices, price_column
+
+
+class PriceMatrix:
+    """
+    Competitor prices of a set of products
+
+    Attributes:
+        models: Product models, one per row
+        sources: Source names, one per column
+        final: (products × sources) price a customer pays (discounted if on sale)
+        regular: (products × sources) regular price
+        discount: (products × sources) discount price, NaN when not on sale
+        has_discount: (products × sources) bool
+        our_price: (products,) our price (NaN if unknown)
+        quantity: (products,) stock quantity
+        index: model -> row
+    """
+
+    def __init__(
+        self,
+        models: Sequence[str],
+        sources: Sequence[str],
+        final: np.ndarray,
+        regular: Optional[np.ndarray] = None,
+        discount: Optional[np.ndarray] = None,
+        our_price: Optional[Sequence[float]] = None,
+        quantity: Optional[Sequence[float]] = None,
+    ):
+        self.models = list(models)
+        self.sources = list(sources)
+        shape = (len(self.models), len(self.sources))
+
+        self.final = np.asarray(final, dtype=float).reshape(shape)
+        self.regular = self.final.copy() if regular is None else np.asarray(regular, dtype=float).reshape(shape)
+        self.discount = np.full(shape, np.nan) if discount is None else np.asarray(discount, dtype=float).reshape(shape)
+        self.has_discount = ~np.isnan(self.discount)
+
+        self.our_price = self._vector(our_price)
+        self.quantity = self._vector(quantity, fill=0.0)
+
+        self._source_index = {source: col for col, source in enumerate(self.sources)}
+
+    @cached_property
+    def index(self) -> Dict[str, int]:
+        """Model -> row"""
+        return {model: row for row, model in enumerate(self.models)}
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def _vector(self, values: Optional[Sequence[float]], fill: float = np.nan) -> np.ndarray:
+        """Per-product float vector (missing values become `fill`)"""
+        if values is None:
+            return np.full(len(self.models), fill)
+        series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+        vector = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+        return np.where(np.isnan(vector), fill, vector)
+
+    # Construction
+
+    @classmethod
+    def from_prices(
+        cls,
+        prices: pd.DataFrame,
+        models: Sequence[str],
+        sources: Sequence[str] = SOURCES,
+        our_price: Optional[Sequence[float]] = None,
+        quantity: Optional[Sequence[float]] = None,
+    ) -> 'PriceMatrix':
+        """
+        Build from a frame with <SOURCE>_regular/_discount/_final columns
+        (the 'Prices' sheet or load_prices() output), row-aligned with models
+        """
+        def block(field: str) -> np.ndarray:
+            columns = [price_column(source, field) for source in sources]
+            return prices.reindex(columns=columns).to_numpy(dtype=float)
+
+        return cls(models, sources, block('final'), block('regular'), block('discount'), our_price, quantity)
+
+    @classmethod
+    def from_comparison(cls, comparison: pd.DataFrame, prices: Optional[pd.DataFrame] = None,
+                        sources: Sequence[str] = SOURCES) -> 'PriceMatrix':
+        """
+        Build from a 'Price Comparison' sheet (+ its 'Prices' sheet if available)
+
+        Uses 'Our Price' and 'Quantity' columns for our side.
+        """
+        prices = load_prices(comparison, prices, sources)
+
+        def column(name: str) -> Optional[pd.Series]:
+            return comparison[name] if name in comparison.columns else None
+
+        models = comparison['Model'].astype(str).tolist() if 'Model' in comparison.columns else [''] * len(comparison)
+        return cls.from_prices(prices, models, sources, column('Our Price'), column('Quantity'))
+
+    @classmethod
+    def from_rows(
+        cls,
+        models: Sequence[str],
+        rows: Iterable[Tuple[int, str, float, Optional[float], Optional[float]]],
+        sources: Optional[Sequence[str]] = None,
+        our_price: Optional[Sequence[float]] = None,
+        quantity: Optional[Sequence[float]] = None,
+    ) -> 'PriceMatrix':
+        """
+        Build from long-format price rows (e.g. CompetitorPrice records)
+
+        Args:
+            models: Product models, one per row of the matrix
+            rows: (product row, source, final price, regular price, discount price)
+            sources: Column order (default: SOURCES, plus unknown sources in order seen)
+        """
+        rows = list(rows)
+        sources = list(sources or SOURCES)
+        for _, source, *_ in rows:
+            if source not in sources:
+                sources.append(source)
+        source_index = {source: col for col, source in enumerate(sources)}
+
+        shape = (len(models), len(sources))
+        final, regular, discount = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+        for row, source, final_price, regular_price, discount_price in rows:
+            col = source_index[source]
+            final[row, col] = np.nan if final_price is None else float(final_price)
+            regular[row, col] = final[row, col] if regular_price is None else float(regular_price)
+            discount[row, col] = np.nan if discount_price is None else float(discount_price)
+
+        return cls(models, sources, final, regular, discount, our_price, quantity)
+
+    # Selection
+
+    def column(self, source: str) -> np.ndarray:
+        """Final prices of one source (all NaN if the source is unknown)"""
+        col = self._source_index.get(source)
+        return self.final[:, col] if col is not None else np.full(len(self.models), np.nan)
+
+    def select(self, sources: Sequence[str]) -> 'PriceMatrix':
+        """Matrix restricted to the given sources (unknown sources are all NaN)"""
+        def block(values: np.ndarray) -> np.ndarray:
+            out = np.full((len(self.models), len(sources)), np.nan)
+            for i, source in enumerate(sources):
+                col = self._source_index.get(source)
+                if col is not None:
+                    out[:, i] = values[:, col]
+            return out
+
+        matrix = PriceMatrix(self.models, sources, block(self.final), block(self.regular), block(self.discount))
+        matrix.our_price, matrix.quantity = self.our_price, self.quantity
+        return matrix
+
+    # Row-wise analytics (one value per product)
+
+    def competitor_count(self) -> np.ndarray:
+        """Number of sources with a price"""
+        return (~np.isnan(self.final)).sum(axis=1)
+
+    def min(self) -> np.ndarray:
+        """Cheapest competitor price (NaN if none)"""
+        return self._reduce(np.nanmin)
+
+    def max(self) -> np.ndarray:
+        """Most expensive competitor price (NaN if none)"""
+        return self._reduce(np.nanmax)
+
+    def mean(self) -> np.ndarray:
+        """Average competitor price (NaN if none)"""
+        return self._reduce(np.nanmean)
+
+    def _reduce(self, func) -> np.ndarray:
+        """Apply a nan-aware reduction per row; rows without prices give NaN"""
+        if self.final.shape[1] == 0:
+            return np.full(len(self.models), np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN rows
+            return func(self.final, axis=1)
+
+    def cheaper_than_any(self, reference: Optional[np.ndarray] = None) -> np.ndarray:
+        """reference (default: our price) below at least one competitor"""
+        reference = self.our_price if reference is None else reference
+        return (reference[:, None] < self.final).any(axis=1)
+
+    def more_expensive_than_any(self, reference: Optional[np.ndarray] = None) -> np.ndarray:
+        """reference (default: our price) above at least one competitor"""
+        reference = self.our_price if reference is None else reference
+        return (reference[:, None] > self.final).any(axis=1)
+
+    def gap_to_min(self, reference: Optional[np.ndarray] = None) -> np.ndarray:
+        """Relative gap of reference to the cheapest competitor, (ref - min) / min"""
+        reference = self.our_price if reference is None else reference
+        cheapest = self.min()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(cheapest > 0, (reference - cheapest) / cheapest, np.nan)
+
+    def price_position(self, reference: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Share of competitors priced below reference (0 = cheapest in market,
+        1 = most expensive); NaN without competitors
+        """
+        reference = self.our_price if reference is None else reference
+        priced = ~np.isnan(self.final)
+        below = (self.final < reference[:, None]) & priced
+        counts = priced.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > 0, below.sum(axis=1) / counts, np.nan)
+
+    # Column-wise analytics (one value per source)
+
+    def coverage(self) -> Dict[str, float]:
+        """Share of products each source has a price for"""
+        if not len(self.models):
+            return {source: 0.0 for source in self.sources}
+        shares = (~np.isnan(self.final)).mean(axis=0)
+        return dict(zip(self.sources, shares.tolist()))
@@ -3,6 +3,7 @@ Product Matcher - Extract and match product models
 """
 import re
 from typing import Optional
+from utils.model_extractor import ModelExtractor
 
 
 def extract_model(product_name: str) -> Optional[str]:
@@ -103,13 +104,9 @@ def fuzzy_match(model1: str, model2: str) -> bool:
     if models_match(model1, model2):
         return True
     
-    norm1 = normalize_model(model1)
-    norm2 = normalize_model(model2)
+    # Same base-model rule as the batch matcher (utils/batch_matcher.py):
+    # ECAM22114 is the base of both ECAM22114B and ECAM22114SB
+    base1 = ModelExtractor.base_model(ModelExtractor.normalize_for_matching(model1))
+    base2 = ModelExtractor.base_model(ModelExtractor.normalize_for_matching(model2))
     
-    # Check if one is a substring of another (for color variants)
-    # ECAM22.114 in both ECAM22.114.B and ECAM22.114.SB
-    base1 = norm1.rsplit('.', 1)[0] if '.' in norm1 else norm1
-    base2 = norm2.rsplit('.', 1)[0] if '.' in norm2 else norm2
-    
-    return base1 == base2
-
+    return bool(base1) and base1 == base2
@@ -0,0 +1,70 @@
+"""
+Streaming workbook writer - openpyxl write-only mode
+Rows are serialized to the sheet XML as they are appended, so memory stays
+flat no matter how many rows the comparison has
+
+Also imported by the web app (the Docker image copies it, see Dockerfile)
+"""
+
+from pathlib import Path
+from typing import BinaryIO, Iterable, Tuple, Union
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+# Rows converted to Python objects at a time (bounds the temporary copy)
+CHUNK_ROWS = 5000
+
+HEADER_FONT = Font(bold=True)
+
+
+def write_workbook(file_path: Union[Path, BinaryIO],
+                   sheets: Iterable[Tuple[str, pd.DataFrame]]) -> Union[Path, BinaryIO]:
+    """
+    Write DataFrames as sheets of one xlsx file, streaming rows to disk
+
+    Output matches DataFrame.to_excel(index=False): bold header row, then one
+    row per record, missing values left empty. Every sheet stores its
+    dimensions, so read-only readers (load_workbook(read_only=True)) size it
+    without parsing all of its rows.
+
+    Args:
+        file_path: Target .xlsx path, or a binary file object (e.g. BytesIO)
+        sheets: (sheet name, DataFrame) pairs in sheet order; may be a generator
+            so sheets are built one at a time
+
+    Returns:
+        Path to the saved file (the file object if one was given)
+    """
+    wb = Workbook(write_only=True)
+
+    for sheet_name, df in sheets:
+        ws = wb.create_sheet(title=sheet_name)
+        # Written before the rows (write-only sheets do not track their size)
+        ws.calculate_dimension = lambda ref=_dimension(df): ref
+        ws.append([_header_cell(ws, column) for column in df.columns])
+
+        for start in range(0, len(df), CHUNK_ROWS):
+            chunk = df.iloc[start:start + CHUNK_ROWS]
+            # object dtype turns numpy scalars into int/float/bool openpyxl accepts
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                ws.append(row)
+
+    wb.save(file_path)
+    return file_path if hasattr(file_path, 'write') else Path(file_path)
+
+
+def _dimension(df: pd.DataFrame) -> str:
+    """Sheet range of a DataFrame written with its header row, e.g. 'A1:H10001'"""
+    return f"A1:{get_column_letter(max(len(df.columns), 1))}{len(df) + 1}"
+
+
+def _header_cell(ws, value) -> WriteOnlyCell:
+    """Bold header cell like pandas writes"""
+    cell = WriteOnlyCell(ws, value=str(value))
+    cell.font = HEADER_FONT
+    return cell
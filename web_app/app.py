@@ -5,6 +5,7 @@ from flask import Flask, request, session
 from flask_login import LoginManager
 from web_app.config import config
 from web_app.database import db, init_db
+from web_app.utils.response_cache import response_cache
 
 # Initialize Flask-Login
 login_manager = LoginManager()
@@ -26,6 +27,7 @@ def create_app(config_name='default'):
     
     # Initialize extensions
     init_db(app)
+    response_cache.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
@@ -2,6 +2,7 @@
 Flask application configuration
 """
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -31,6 +32,14 @@ class Config:
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB max file size
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+    UPLOAD_ASYNC = True  # Process /api/upload in a background worker (False: inside the request)
+    
+    # Response cache - rendered upload pages (web_app/utils/response_cache.py)
+    CACHE_MAX_ENTRIES = 32  # Pages per process
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')  # Shared by all workers (optional, needs redis)
+    CACHE_GENERATION_FILE = os.environ.get('CACHE_GENERATION_FILE') or \
+        os.path.join(tempfile.gettempdir(), 'price_monitor_cache_generation')
+    CACHE_TTL = 24 * 60 * 60  # Seconds a page is kept in Redis
     
     # Pagination
     ITEMS_PER_PAGE = 20
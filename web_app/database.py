@@ -1,11 +1,13 @@
 """
 Database connection and initialization
 """
+import os
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 
 db = SQLAlchemy()
-migrate = Migrate()
+# Revisions ship inside the package (the Docker image deploys web_app/, not the project root)
+migrate = Migrate(directory=os.path.join(os.path.dirname(__file__), 'migrations'))
 
 def init_db(app):
     """Initialize database with Flask app"""
@@ -14,7 +16,7 @@ def init_db(app):
     
     with app.app_context():
         # Import all models to ensure they are registered with SQLAlchemy
-        from web_app.models import user, upload, product, competitor_price, statistic
+        from web_app.models import user, upload, product, competitor_price, statistic, catalog_product, price_observation
         
         # Create tables if they don't exist (safe for production)
         try:
@@ -28,4 +30,3 @@ def init_db(app):
         # Admin user creation disabled - using ENV-based authentication (SimpleUser)
         # Authentication now uses ADMIN_USERNAME and ADMIN_PASSWORD from environment variables
         # See web_app/utils/simple_user.py for implementation
-
@@ -0,0 +1,50 @@
+"""uploads.error, uploads.content_hash and richer statistics columns
+
+Revision ID: 2a6f8d4b1c57
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a6f8d4b1c57'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# table -> columns added to it
+COLUMNS = {
+    'uploads': [
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=True),
+    ],
+    'statistics': [
+        sa.Column('competitor_coverage', sa.JSON(), nullable=True),
+        sa.Column('median_gap_pct', sa.Numeric(precision=8, scale=2), nullable=True),
+    ],
+}
+
+
+def upgrade():
+    # init_db() creates the columns on new databases (create_all) - only add what is missing
+    inspector = sa.inspect(op.get_bind())
+    for table, columns in COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column.copy())
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, columns in COLUMNS.items():
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                if column.name in existing:
+                    batch_op.drop_column(column.name)
@@ -0,0 +1,146 @@
+"""catalog_products dimension and price_observations fact table
+
+Backfills both from the products and competitor prices of completed uploads
+whose date has no observations yet.
+
+Revision ID: 4b7e2c91d0a3
+Revises: 2a6f8d4b1c57
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2c91d0a3'
+down_revision = '2a6f8d4b1c57'
+branch_labels = None
+depends_on = None
+
+OUR_SOURCE = 'OUR'
+
+# Snapshots of the tables as of this revision (not the current models)
+uploads = sa.table('uploads', sa.column('id'), sa.column('upload_date'), sa.column('status'))
+products = sa.table('products', sa.column('id'), sa.column('upload_id'), sa.column('model'), sa.column('name'),
+                    sa.column('brand'), sa.column('our_price'), sa.column('quantity'))
+competitor_prices = sa.table('competitor_prices', sa.column('product_id'), sa.column('competitor'),
+                             sa.column('price'), sa.column('regular_price'), sa.column('discount_price'))
+catalog_products = sa.table('catalog_products', sa.column('id'), sa.column('model'), sa.column('name'),
+                            sa.column('brand'))
+price_observations = sa.table('price_observations', sa.column('catalog_product_id'), sa.column('date'),
+                              sa.column('source'), sa.column('price'), sa.column('regular_price'),
+                              sa.column('discount_price'), sa.column('quantity'))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # init_db() may have created the tables already (create_all runs on app start)
+    if not inspector.has_table('catalog_products'):
+        op.create_table(
+            'catalog_products',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('model', sa.String(length=100), nullable=False),
+            sa.Column('name', sa.String(length=500), nullable=True),
+            sa.Column('brand', sa.String(length=50), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('model'),
+        )
+    if not inspector.has_table('price_observations'):
+        op.create_table(
+            'price_observations',
+            sa.Column('catalog_product_id', sa.Integer(), nullable=False),
+            sa.Column('date', sa.Date(), nullable=False),
+            sa.Column('source', sa.String(length=50), nullable=False),
+            sa.Column('price', sa.Numeric(precision=10, scale=2), nullable=True),
+            sa.Column('regular_price', sa.Numeric(precision=10, scale=2), nullable=True),
+            sa.Column('discount_price', sa.Numeric(precision=10, scale=2), nullable=True),
+            sa.Column('quantity', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['catalog_product_id'], ['catalog_products.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('catalog_product_id', 'date', 'source'),
+        )
+    indexes = {index['name'] for index in sa.inspect(bind).get_indexes('price_observations')}
+    if 'ix_price_observations_date_source' not in indexes:
+        op.create_index('ix_price_observations_date_source', 'price_observations', ['date', 'source'])
+
+    if inspector.has_table('uploads') and inspector.has_table('products'):
+        _backfill(bind)
+
+
+def downgrade():
+    op.drop_index('ix_price_observations_date_source', table_name='price_observations')
+    op.drop_table('price_observations')
+    op.drop_table('catalog_products')
+
+
+def _backfill(bind):
+    """Observations of every completed upload date that has none (oldest first)"""
+    recorded = set(bind.execute(sa.select(price_observations.c.date).distinct()).scalars())
+    pending = [
+        upload for upload in bind.execute(
+            sa.select(uploads.c.id, uploads.c.upload_date)
+            .where(uploads.c.status == 'completed')
+            .order_by(uploads.c.upload_date)
+        )
+        if upload.upload_date not in recorded
+    ]
+    if not pending:
+        return
+
+    catalog = {row.model: row.id for row in bind.execute(sa.select(catalog_products.c.id, catalog_products.c.model))}
+
+    for upload in pending:
+        rows = bind.execute(
+            sa.select(products.c.id, products.c.model, products.c.name, products.c.brand,
+                      products.c.our_price, products.c.quantity)
+            .where(products.c.upload_id == upload.id)
+            .order_by(products.c.id)
+        ).all()
+
+        # First product of each model (a model listed twice keeps its first row)
+        by_model = {}
+        for row in rows:
+            by_model.setdefault(row.model.strip().upper(), row)
+
+        new_models = [model for model in by_model if model not in catalog]
+        if new_models:
+            bind.execute(catalog_products.insert(), [
+                {'model': model, 'name': by_model[model].name, 'brand': by_model[model].brand}
+                for model in new_models
+            ])
+            catalog.update({
+                row.model: row.id for row in bind.execute(
+                    sa.select(catalog_products.c.id, catalog_products.c.model)
+                    .where(catalog_products.c.model.in_(new_models))
+                )
+            })
+
+        product_catalog = {row.id: catalog[model] for model, row in by_model.items()}
+        observations = [
+            {'catalog_product_id': catalog[model], 'date': upload.upload_date, 'source': OUR_SOURCE,
+             'price': row.our_price, 'regular_price': row.our_price, 'discount_price': None,
+             'quantity': row.quantity}
+            for model, row in by_model.items()
+        ]
+        seen = set()
+        for price in bind.execute(
+            sa.select(competitor_prices.c.product_id, competitor_prices.c.competitor, competitor_prices.c.price,
+                      competitor_prices.c.regular_price, competitor_prices.c.discount_price)
+            .join(products, products.c.id == competitor_prices.c.product_id)
+            .where(products.c.upload_id == upload.id)
+        ):
+            key = (price.product_id, price.competitor)
+            if price.product_id not in product_catalog or key in seen:
+                continue
+            seen.add(key)
+            observations.append({
+                'catalog_product_id': product_catalog[price.product_id], 'date': upload.upload_date,
+                'source': price.competitor, 'price': price.price,
+                'regular_price': price.regular_price if price.regular_price is not None else price.price,
+                'discount_price': price.discount_price, 'quantity': None,
+            })
+
+        if observations:
+            bind.execute(price_observations.insert(), observations)
@@ -0,0 +1,63 @@
+"""composite indexes of the comparison, filter and history queries
+
+Replaces the single-column products.model and competitor_prices.product_id
+indexes with composites that start with the same column.
+
+Revision ID: 9c3d5e7f1a24
+Revises: 4b7e2c91d0a3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3d5e7f1a24'
+down_revision = '4b7e2c91d0a3'
+branch_labels = None
+depends_on = None
+
+# name -> (table, columns, extra create_index arguments)
+INDEXES = {
+    'ix_products_upload_model': ('products', ['upload_id', 'model'], {}),
+    'ix_products_upload_brand_price': ('products', ['upload_id', 'brand', 'our_price'], {}),
+    'ix_products_model_upload': ('products', ['model', 'upload_id'], {}),
+    'ix_competitor_prices_product_competitor': (
+        'competitor_prices', ['product_id', 'competitor'],
+        {'postgresql_include': ['price', 'regular_price', 'discount_price', 'has_discount']},
+    ),
+}
+
+# Covered by a composite above (same leading column)
+REPLACED = {
+    'ix_products_model': ('products', ['model']),
+    'ix_competitor_prices_product_id': ('competitor_prices', ['product_id']),
+}
+
+
+def upgrade():
+    # init_db() creates these on new databases (create_all) - only add what is missing
+    existing = _index_names()
+    for name, (table, columns, kwargs) in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, table, columns, **kwargs)
+    for name, (table, _) in REPLACED.items():
+        if name in existing:
+            op.drop_index(name, table_name=table)
+
+
+def downgrade():
+    existing = _index_names()
+    for name, (table, columns) in REPLACED.items():
+        if name not in existing:
+            op.create_index(name, table, columns)
+    for name, (table, _, _) in INDEXES.items():
+        if name in existing:
+            op.drop_index(name, table_name=table)
+
+
+def _index_names():
+    """Names of the indexes on products and competitor_prices"""
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for table in ('products', 'competitor_prices') for index in inspector.get_indexes(table)}
@@ -6,6 +6,8 @@ from web_app.models.upload import Upload
 from web_app.models.product import Product
 from web_app.models.competitor_price import CompetitorPrice
 from web_app.models.statistic import Statistic
+from web_app.models.catalog_product import CatalogProduct
+from web_app.models.price_observation import PriceObservation
 
-__all__ = ['User', 'Upload', 'Product', 'CompetitorPrice', 'Statistic']
+__all__ = ['User', 'Upload', 'Product', 'CompetitorPrice', 'Statistic', 'CatalogProduct', 'PriceObservation']
 
@@ -0,0 +1,25 @@
+"""
+CatalogProduct model - one row per product model across all uploads
+"""
+from web_app.database import db
+
+class CatalogProduct(db.Model):
+    """Product dimension - price history (PriceObservation) hangs off it"""
+    __tablename__ = 'catalog_products'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    model = db.Column(db.String(100), unique=True, nullable=False)  # canonical_model()
+    name = db.Column(db.String(500))  # Latest name seen
+    brand = db.Column(db.String(50))
+    
+    # Relationships
+    observations = db.relationship('PriceObservation', backref='catalog_product', lazy='dynamic',
+                                   cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<CatalogProduct {self.model}>'
+    
+    @staticmethod
+    def canonical_model(model):
+        """Catalog key of a product model: trimmed, upper case"""
+        return str(model).strip().upper()
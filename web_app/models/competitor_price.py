@@ -6,9 +6,15 @@ from web_app.database import db
 class CompetitorPrice(db.Model):
     """Competitor price model - prices from different competitors"""
     __tablename__ = 'competitor_prices'
+    __table_args__ = (
+        # Prices of a product, by competitor; covering on PostgreSQL (index-only
+        # competitor summaries of the comparison filters)
+        db.Index('ix_competitor_prices_product_competitor', 'product_id', 'competitor',
+                 postgresql_include=['price', 'regular_price', 'discount_price', 'has_discount']),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
     
     competitor = db.Column(db.String(50), nullable=False, index=True)  # ALTA, KONTAKT, ELITE, etc.
     price = db.Column(db.Numeric(10, 2))  # Main price (discount if available, regular otherwise)
@@ -0,0 +1,29 @@
+"""
+PriceObservation model - one price of one product from one source on one date
+"""
+from web_app.database import db
+
+# Source of our own price (and stock) observations; competitors use their names
+OUR_SOURCE = 'OUR'
+
+class PriceObservation(db.Model):
+    """Price fact - history and trend queries read this instead of products/competitor_prices"""
+    __tablename__ = 'price_observations'
+    __table_args__ = (
+        # Primary key (catalog_product_id, date, source) serves per-product history;
+        # this index serves per-date queries across products
+        db.Index('ix_price_observations_date_source', 'date', 'source'),
+    )
+    
+    catalog_product_id = db.Column(db.Integer, db.ForeignKey('catalog_products.id', ondelete='CASCADE'),
+                                   primary_key=True)
+    date = db.Column(db.Date, primary_key=True)  # Upload date
+    source = db.Column(db.String(50), primary_key=True)  # OUR_SOURCE, ALTA, KONTAKT, ...
+    
+    price = db.Column(db.Numeric(10, 2))  # Price a customer pays (discount if on sale)
+    regular_price = db.Column(db.Numeric(10, 2))
+    discount_price = db.Column(db.Numeric(10, 2))  # NULL when not on sale
+    quantity = db.Column(db.Integer)  # Our stock (OUR_SOURCE rows only)
+    
+    def __repr__(self):
+        return f'<PriceObservation {self.catalog_product_id} {self.source} {self.date}: {self.price}>'
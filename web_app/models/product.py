@@ -6,11 +6,19 @@ from web_app.database import db
 class Product(db.Model):
     """Product model - our inventory products"""
     __tablename__ = 'products'
+    __table_args__ = (
+        # Products of an upload by model (comparison/export order, re-upload merge)
+        db.Index('ix_products_upload_model', 'upload_id', 'model'),
+        # Brand and price filters of the comparison page
+        db.Index('ix_products_upload_brand_price', 'upload_id', 'brand', 'our_price'),
+        # One model across uploads (history)
+        db.Index('ix_products_model_upload', 'model', 'upload_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     upload_id = db.Column(db.Integer, db.ForeignKey('uploads.id', ondelete='CASCADE'), nullable=False, index=True)
     
-    model = db.Column(db.String(100), index=True)
+    model = db.Column(db.String(100))
     name = db.Column(db.String(500))
     quantity = db.Column(db.Integer)
     our_price = db.Column(db.Numeric(10, 2))
@@ -15,6 +15,8 @@ class Statistic(db.Model):
     products_cheaper = db.Column(db.Integer)  # Products where we are cheaper
     products_expensive = db.Column(db.Integer)  # Products where we are more expensive
     products_no_competitors = db.Column(db.Integer)  # Products with no competitor data
+    competitor_coverage = db.Column(db.JSON)  # {competitor: % of products with its price}
+    median_gap_pct = db.Column(db.Numeric(8, 2))  # Median % gap of our price to the cheapest competitor
     
     def __repr__(self):
         return f'<Statistic for upload {self.upload_id}>'
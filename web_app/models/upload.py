@@ -15,6 +15,8 @@ class Upload(db.Model):
     file_name = db.Column(db.String(255))
     total_products = db.Column(db.Integer)
     status = db.Column(db.String(50), default='completed')  # completed, processing, failed
+    error = db.Column(db.Text)  # Error message of a failed upload
+    content_hash = db.Column(db.String(64))  # SHA-256 of the uploaded file (re-uploads of it are skipped)
     
     # Relationships
     products = db.relationship('Product', backref='upload', lazy='dynamic', cascade='all, delete-orphan')
@@ -1,9 +1,12 @@
 """
 API routes for data upload
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for
 from functools import wraps
-from web_app.services.upload_service import process_upload
+from web_app.services.upload_service import (
+    queue_upload, get_upload_status, upload_suffix, UploadBaseMismatch, UploadInProgress, UPLOAD_FORMATS
+)
+import json
 import os
 
 bp = Blueprint('api', __name__, url_prefix='/api')
@@ -38,11 +41,26 @@ def upload():
     """
     Upload Excel file with price comparison data
     
-    Expected: multipart/form-data with 'file' field
+    The file is processed in the background: the response (202) carries a
+    job id, poll GET /api/upload/<job_id> for status and statistics.
+    
+    Expected: multipart/form-data with 'file' field - an .xlsx workbook or,
+    by the part's Content-Type, a compact table (GET /api/upload/formats)
     Headers: X-API-Key: <your_api_key>
+             X-Content-SHA256: <sha256 of the file> (optional)
+             X-Base-SHA256: <sha256 of the base file> (delta upload only)
+    
+    A file identical to today's completed upload is not processed again:
+    the response (200) carries that upload with 'duplicate': true.
+    
+    Delta upload (X-Base-SHA256 set): the file has only the rows of models
+    changed since today's upload with that hash, the 'removed' form field a
+    JSON list of models deleted since; X-Content-SHA256 is the hash of the
+    full file. If today's upload is no longer the base the response is 409
+    with 'full_upload_required': true.
     
     Returns:
-        JSON with upload status and statistics
+        JSON with job id and status
     """
     try:
         # Check if file is present
@@ -61,24 +79,98 @@ def upload():
                 'error': 'No file selected'
             }), 400
         
-        # Check file extension
-        if not file.filename.endswith('.xlsx'):
+        # Check file format (Content-Type, else file extension)
+        if upload_suffix(file) is None:
             return jsonify({
                 'success': False,
-                'error': 'Only .xlsx files are accepted'
+                'error': f"Unsupported file format, accepted: {', '.join(UPLOAD_FORMATS)}"
             }), 400
         
-        # Process upload
-        result = process_upload(file)
+        # Delta against today's upload
+        delta = None
+        base_hash = request.headers.get('X-Base-SHA256')
+        if base_hash:
+            try:
+                removed = json.loads(request.form.get('removed') or '[]')
+            except ValueError:
+                removed = None
+            if not isinstance(removed, list):
+                return jsonify({
+                    'success': False,
+                    'error': "'removed' must be a JSON list of models"
+                }), 400
+            delta = {'base_hash': base_hash, 'removed': [str(model) for model in removed]}
+        
+        # Queue upload for processing
+        job = queue_upload(file, content_hash=request.headers.get('X-Content-SHA256'), delta=delta)
+        
+        if job['status'] == 'failed':
+            return jsonify({
+                'success': False,
+                'error': job['error']
+            }), 500
         
         return jsonify({
             'success': True,
-            'message': 'File uploaded successfully',
-            'upload_id': result['upload_id'],
-            'upload_date': result['upload_date'],
-            'statistics': result['statistics']
-        })
+            'message': 'File accepted for processing' if job['status'] == 'processing'
+                       else 'File already uploaded, nothing changed' if job.get('duplicate')
+                       else 'File uploaded successfully',
+            'status_url': url_for('api.upload_status', job_id=job['job_id']),
+            **job
+        }), 202 if job['status'] == 'processing' else 200
+    
+    except UploadInProgress as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+    
+    except UploadBaseMismatch as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'full_upload_required': True
+        }), 409
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/upload/formats', methods=['GET'])
+@require_api_key
+def upload_formats():
+    """Upload Content-Types the server accepts, most compact first, and delta support (for uploader script)"""
+    return jsonify({
+        'success': True,
+        'formats': list(UPLOAD_FORMATS),
+        'delta': True
+    })
+
+@bp.route('/upload/<int:job_id>', methods=['GET'])
+@require_api_key
+def upload_status(job_id):
+    """
+    Status of an upload job
     
+    Returns:
+        JSON with status (processing/completed/failed), statistics once
+        completed and the error message if failed
+    """
+    try:
+        job = get_upload_status(job_id)
+        
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': f'Upload job not found: {job_id}'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            **job
+        })
     except Exception as e:
         return jsonify({
             'success': False,
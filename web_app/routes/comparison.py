@@ -11,11 +11,13 @@ from web_app.services.comparison_service import (
     export_to_excel
 )
 from web_app.services.report_service import generate_pdf_report
+from web_app.utils.response_cache import cached_response, skip_response_cache
 
 bp = Blueprint('comparison', __name__, url_prefix='/comparison')
 
 @bp.route('/')
 @login_required
+@cached_response
 def index():
     """Latest price comparison"""
     try:
@@ -29,6 +31,7 @@ def index():
             competitors=data['competitors']
         )
     except Exception as e:
+        skip_response_cache()
         return render_template(
             'comparison/index.html',
             upload=None,
@@ -40,6 +43,7 @@ def index():
 
 @bp.route('/date/<date_str>')
 @login_required
+@cached_response
 def by_date(date_str):
     """Comparison by specific date"""
     try:
@@ -53,6 +57,7 @@ def by_date(date_str):
             competitors=data['competitors']
         )
     except Exception as e:
+        skip_response_cache()
         return render_template(
             'comparison/index.html',
             upload=None,
@@ -1,18 +1,21 @@
 """
 History routes - all uploads
 """
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request
 from flask_login import login_required
 from web_app.services.history_service import (
     get_all_uploads,
     get_upload_details,
-    get_price_trends
+    get_price_trends,
+    get_price_trend_series
 )
+from web_app.utils.response_cache import cached_response, skip_response_cache
 
 bp = Blueprint('history', __name__, url_prefix='/history')
 
 @bp.route('/')
 @login_required
+@cached_response
 def index():
     """History page - all uploads"""
     try:
@@ -23,6 +26,7 @@ def index():
             uploads=uploads
         )
     except Exception as e:
+        skip_response_cache()
         return render_template(
             'history/index.html',
             uploads=[],
@@ -48,12 +52,41 @@ def details(upload_id):
             'error': str(e)
         }), 404
 
+@bp.route('/trends')
+@login_required
+def trends_series():
+    """
+    Aligned price series of many products (AJAX)
+    
+    ?models=A,B,C&from=YYYY-MM-DD&to=YYYY-MM-DD&points=N - from, to and
+    points are optional; with more dates than points, series are reduced to
+    per-bucket min/max
+    """
+    try:
+        points = request.args.get('points', type=int)
+        series = get_price_trend_series(
+            request.args.get('models', '').split(','),
+            request.args.get('from'),
+            request.args.get('to'),
+            points
+        )
+        
+        return jsonify({
+            'success': True,
+            **series
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
 @bp.route('/trends/<model>')
 @login_required
 def trends(model):
-    """Price trends for a product (AJAX)"""
+    """Price trends for a product (AJAX), optionally within ?from=&to= (YYYY-MM-DD)"""
     try:
-        trends_data = get_price_trends(model)
+        trends_data = get_price_trends(model, request.args.get('from'), request.args.get('to'))
         
         return jsonify({
             'success': True,
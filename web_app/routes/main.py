@@ -4,6 +4,7 @@ Main routes - Dashboard
 from flask import Blueprint, render_template, redirect, url_for
 from flask_login import login_required
 from web_app.services.dashboard_service import get_dashboard_data
+from web_app.utils.response_cache import cached_response, skip_response_cache
 
 bp = Blueprint('main', __name__)
 
@@ -14,6 +15,7 @@ def index():
 
 @bp.route('/dashboard')
 @login_required
+@cached_response
 def dashboard():
     """Main dashboard page"""
     try:
@@ -28,6 +30,7 @@ def dashboard():
             recent_uploads=data['recent_uploads']
         )
     except Exception as e:
+        skip_response_cache()
         # If no data available, show empty dashboard
         return render_template(
             'dashboard/index.html',
@@ -2,12 +2,13 @@
 Comparison service - price comparison data
 """
 import pandas as pd
-from pathlib import Path
 from io import BytesIO
 from web_app.models import Upload, Product, CompetitorPrice, Statistic
 from web_app.database import db
+from utils.price_columns import PRICE_FIELDS, PRICES_SHEET, format_display_prices, price_column, price_columns
+from utils.workbook_writer import write_workbook
 from datetime import datetime
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, case, func
 
 def get_latest_comparison():
     """
@@ -67,15 +68,22 @@ def _get_comparison_data(upload):
     # Get statistics
     statistics = Statistic.query.filter_by(upload_id=upload.id).first()
     
-    # Get all unique competitors
-    competitors = (
-        db.session.query(CompetitorPrice.competitor)
+    # All competitor prices of the upload in one query (not one per product)
+    competitor_prices = (
+        CompetitorPrice.query
         .join(Product, CompetitorPrice.product_id == Product.id)
         .filter(Product.upload_id == upload.id)
-        .distinct()
+        .order_by(CompetitorPrice.id)
         .all()
     )
-    competitor_names = [c[0] for c in competitors]
+    
+    # Organize competitor prices by product and competitor name
+    prices_by_product = {}
+    for cp in competitor_prices:
+        prices_by_product.setdefault(cp.product_id, {})[cp.competitor] = cp
+    
+    # Get all unique competitors
+    competitor_names = list(dict.fromkeys(cp.competitor for cp in competitor_prices))
     # Put our site first (robust match: DIM_KAVA / DIM KAVA / DIMKAVA)
     def is_dimkava(name: str) -> bool:
         n = (name or '').strip().lower().replace(' ', '_')
@@ -86,19 +94,13 @@ def _get_comparison_data(upload):
         competitor_names = [dim] + [c for c in competitor_names if c != dim]
     
     # Format products with their competitor prices
-    formatted_products = []
-    for product in products:
-        competitor_prices = CompetitorPrice.query.filter_by(product_id=product.id).all()
-        
-        # Organize competitor prices by competitor name
-        prices_by_competitor = {}
-        for cp in competitor_prices:
-            prices_by_competitor[cp.competitor] = cp
-        
-        formatted_products.append({
+    formatted_products = [
+        {
             'product': product,
-            'competitor_prices': prices_by_competitor
-        })
+            'competitor_prices': prices_by_product.get(product.id, {})
+        }
+        for product in products
+    ]
     
     return {
         'upload': upload,
@@ -107,10 +109,52 @@ def _get_comparison_data(upload):
         'competitors': competitor_names
     }
 
+def _is_dimkava_sql(column):
+    """SQL version of is_dimkava(): DIM_KAVA / DIM KAVA / DIMKAVA"""
+    return func.replace(func.lower(func.trim(column)), ' ', '_').in_(['dim_kava', 'dimkava'])
+
+def _effective_price_sql():
+    """Price a customer pays: discount if on sale, else regular, else price (zero = missing)"""
+    return case(
+        (and_(CompetitorPrice.has_discount, CompetitorPrice.discount_price.isnot(None),
+              CompetitorPrice.discount_price != 0), CompetitorPrice.discount_price),
+        (and_(CompetitorPrice.regular_price.isnot(None), CompetitorPrice.regular_price != 0),
+         CompetitorPrice.regular_price),
+        (and_(CompetitorPrice.price.isnot(None), CompetitorPrice.price != 0), CompetitorPrice.price),
+        else_=None
+    )
+
+def _competitor_summary(upload_id, competitor=None):
+    """
+    Per-product aggregate of competitor prices for an upload
+    
+    Columns: product_id, competitor_count, min_price, max_price, dim_price
+    (our website price) and has_competitor (1 if `competitor` has a price)
+    """
+    price = _effective_price_sql()
+    return (
+        db.session.query(
+            CompetitorPrice.product_id.label('product_id'),
+            func.count(CompetitorPrice.id).label('competitor_count'),
+            func.min(price).label('min_price'),
+            func.max(price).label('max_price'),
+            func.max(case((_is_dimkava_sql(CompetitorPrice.competitor), price), else_=None)).label('dim_price'),
+            func.max(case((CompetitorPrice.competitor == (competitor or ''), 1), else_=0)).label('has_competitor'),
+        )
+        .join(Product, CompetitorPrice.product_id == Product.id)
+        .filter(Product.upload_id == upload_id)
+        .group_by(CompetitorPrice.product_id)
+        .subquery()
+    )
+
 def filter_products(upload_id, filters):
     """
     Filter products based on criteria
     
+    All filters, including the competitor based ones, run in SQL: products are
+    joined with a per-product competitor summary and their competitor prices,
+    so the whole request is a single query.
+    
     Args:
         upload_id: Upload ID
         filters: dict with filter criteria
@@ -118,7 +162,15 @@ def filter_products(upload_id, filters):
     Returns:
         list: filtered products
     """
-    query = Product.query.filter_by(upload_id=upload_id)
+    summary = _competitor_summary(upload_id, filters.get('competitor'))
+    competitor_count = func.coalesce(summary.c.competitor_count, 0)
+    
+    query = (
+        db.session.query(Product, CompetitorPrice)
+        .outerjoin(summary, summary.c.product_id == Product.id)
+        .outerjoin(CompetitorPrice, CompetitorPrice.product_id == Product.id)
+        .filter(Product.upload_id == upload_id)
+    )
     
     # Brand filter
     if filters.get('brand'):
@@ -141,90 +193,52 @@ def filter_products(upload_id, filters):
             )
         )
     
-    products = query.all()
+    # No competitors filter
+    if filters.get('no_competitors'):
+        query = query.filter(competitor_count == 0)
     
-    # Additional filters that require competitor data
-    if any([filters.get('cheaper'), filters.get('more_expensive'), filters.get('no_competitors'), filters.get('competitor')]):
-        filtered_products = []
-        
-        for product in products:
-            competitor_prices = CompetitorPrice.query.filter_by(product_id=product.id).all()
-            # Determine baseline: use Dim Kava price if present, else product.our_price
-            def is_dimkava(name: str) -> bool:
-                n = (name or '').strip().lower().replace(' ', '_')
-                return n in {'dim_kava', 'dimkava'}
-            dim_cp = next((cp for cp in competitor_prices if is_dimkava(cp.competitor)), None)
-            baseline_price = None
-            if dim_cp:
-                if dim_cp.has_discount and dim_cp.discount_price:
-                    baseline_price = float(dim_cp.discount_price)
-                elif dim_cp.regular_price:
-                    baseline_price = float(dim_cp.regular_price)
-                elif dim_cp.price:
-                    baseline_price = float(dim_cp.price)
-            if baseline_price is None:
-                baseline_price = float(product.our_price) if product.our_price is not None else None
-            
-            # No competitors filter
-            if filters.get('no_competitors') and len(competitor_prices) > 0:
-                continue
-            
-            # Specific competitor filter
-            if filters.get('competitor'):
-                has_competitor = any(cp.competitor == filters['competitor'] for cp in competitor_prices)
-                if not has_competitor:
-                    continue
-            
-            # Cheaper/more expensive filter
-            if filters.get('cheaper') or filters.get('more_expensive'):
-                if len(competitor_prices) == 0:
-                    continue
-                
-                # Check if we are cheaper or more expensive vs competitors using baseline
-                def cp_price_val(cp):
-                    if cp.has_discount and cp.discount_price:
-                        return float(cp.discount_price)
-                    if cp.regular_price:
-                        return float(cp.regular_price)
-                    return float(cp.price) if cp.price else None
-                comp_values = [cp_price_val(cp) for cp in competitor_prices if cp_price_val(cp) is not None]
-                if baseline_price is None or not comp_values:
-                    continue
-                is_cheaper = any(baseline_price < v for v in comp_values)
-                is_more_expensive = any(baseline_price > v for v in comp_values)
-                
-                if filters.get('cheaper') and not is_cheaper:
-                    continue
-                if filters.get('more_expensive') and not is_more_expensive:
-                    continue
-            
-            filtered_products.append(product)
+    # Specific competitor filter
+    if filters.get('competitor'):
+        query = query.filter(summary.c.has_competitor == 1)
+    
+    # Cheaper/more expensive filter - baseline is our website (Dim Kava) price
+    # if present, else product.our_price; compared against every competitor price
+    if filters.get('cheaper') or filters.get('more_expensive'):
+        baseline_price = func.coalesce(summary.c.dim_price, Product.our_price)
+        query = query.filter(competitor_count > 0, baseline_price.isnot(None), summary.c.min_price.isnot(None))
         
-        products = filtered_products
+        if filters.get('cheaper'):
+            query = query.filter(baseline_price < summary.c.max_price)
+        if filters.get('more_expensive'):
+            query = query.filter(baseline_price > summary.c.min_price)
+    
+    rows = query.order_by(Product.id, CompetitorPrice.id).all()
     
-    # Format for JSON response
+    # Format for JSON response (one row per product + competitor price)
     result = []
-    for product in products:
-        competitor_prices = CompetitorPrice.query.filter_by(product_id=product.id).all()
+    by_product = {}
+    for product, cp in rows:
+        item = by_product.get(product.id)
+        if item is None:
+            item = by_product[product.id] = {
+                'id': product.id,
+                'model': product.model,
+                'name': product.name,
+                'brand': product.brand,
+                'our_price': float(product.our_price),
+                'quantity': product.quantity,
+                'competitors': []
+            }
+            result.append(item)
         
-        result.append({
-            'id': product.id,
-            'model': product.model,
-            'name': product.name,
-            'brand': product.brand,
-            'our_price': float(product.our_price),
-            'quantity': product.quantity,
-            'competitors': [
-                {
-                    'name': cp.competitor,
-                    'price': float(cp.price),
-                    'has_discount': cp.has_discount,
-                    'regular_price': float(cp.regular_price) if cp.regular_price else None,
-                    'discount_price': float(cp.discount_price) if cp.discount_price else None
-                }
-                for cp in competitor_prices
-            ]
-        })
+        if cp is not None:
+            item['competitors'].append({
+                'name': cp.competitor,
+                'price': float(cp.price),
+                'has_discount': cp.has_discount,
+                'regular_price': float(cp.regular_price) if cp.regular_price else None,
+                'discount_price': float(cp.discount_price) if cp.discount_price else None
+            })
     
     return result
 
@@ -232,6 +246,9 @@ def export_to_excel(upload_id):
     """
     Export comparison to Excel file with full structure (same as local version)
     
+    Products and competitor prices are fetched in one query, pivoted with
+    pandas and streamed into a write-only workbook.
+    
     Args:
         upload_id: Upload ID
     
@@ -243,20 +260,35 @@ def export_to_excel(upload_id):
     if not upload:
         raise Exception(f"Upload not found: {upload_id}")
     
-    # Get all products and data for this upload
-    products = Product.query.filter_by(upload_id=upload_id).order_by(Product.model).all()
     statistics = Statistic.query.filter_by(upload_id=upload_id).first()
     
-    # Get all unique competitors
-    competitors = (
-        db.session.query(CompetitorPrice.competitor)
-        .join(Product, CompetitorPrice.product_id == Product.id)
+    # All products and their competitor prices in one query
+    rows = (
+        db.session.query(Product, CompetitorPrice)
+        .outerjoin(CompetitorPrice, CompetitorPrice.product_id == Product.id)
         .filter(Product.upload_id == upload_id)
-        .distinct()
-        .order_by(CompetitorPrice.competitor)
+        .order_by(Product.model, Product.id, CompetitorPrice.id)
         .all()
     )
-    competitor_names = [c[0] for c in competitors]
+    products = list(dict.fromkeys(product for product, _ in rows))
+    product_rows = {product.id: i for i, product in enumerate(products)}
+    
+    # Long format: one row per product + competitor (first price if duplicated)
+    competitor_prices = pd.DataFrame(
+        [
+            (product_rows[cp.product_id], cp.competitor, cp.price, cp.regular_price,
+             cp.discount_price, cp.has_discount, cp.url)
+            for _, cp in rows if cp is not None
+        ],
+        columns=['row', 'competitor', 'price', 'regular_price', 'discount_price', 'has_discount', 'url']
+    ).drop_duplicates(['row', 'competitor'])
+    for column in ['price', 'regular_price', 'discount_price']:
+        # Zero counts as missing, like everywhere else in the app
+        values = pd.to_numeric(competitor_prices[column], errors='coerce')
+        competitor_prices[column] = values.where(values != 0)
+    
+    # Get all unique competitors
+    competitor_names = sorted(competitor_prices['competitor'].unique())
     # Put our site first (robust match: DIM_KAVA / DIM KAVA / DIMKAVA)
     def is_dimkava(name: str) -> bool:
         n = (name or '').strip().lower().replace(' ', '_')
@@ -266,80 +298,72 @@ def export_to_excel(upload_id):
         dim = dim_names[0]
         competitor_names = [dim] + [c for c in competitor_names if c != dim]
     
-    # Build main comparison table
-    comparison_rows = []
-    for product in products:
-        row = {
-            'Quantity': product.quantity or 0,
-            'Model': product.model or '-',
-            'Product Name': product.name or '-',
-            'Our Price': float(product.our_price) if product.our_price else 0.0,
-        }
-        
-        # Add competitor prices
-        competitor_prices = CompetitorPrice.query.filter_by(product_id=product.id).all()
-        prices_by_competitor = {cp.competitor: cp for cp in competitor_prices}
-        
+    # Numeric prices: regular + discount when on sale, otherwise the single price
+    on_sale = (
+        competitor_prices['has_discount'].fillna(False).astype(bool)
+        & competitor_prices['regular_price'].notna()
+        & competitor_prices['discount_price'].notna()
+    )
+    single = competitor_prices['price'].where(~on_sale)
+    competitor_prices['regular'] = competitor_prices['regular_price'].where(on_sale, single)
+    competitor_prices['discount'] = competitor_prices['discount_price'].where(on_sale)
+    competitor_prices['final'] = competitor_prices['discount_price'].where(on_sale, single)
+    
+    # Pivot to one row per product, <COMPETITOR>_regular/_discount/_final columns
+    prices_df = pd.DataFrame({'Model': [product.model or '-' for product in products]})
+    if competitor_names:
+        wide = competitor_prices.pivot(
+            index='row', columns='competitor', values=list(PRICE_FIELDS)
+        ).reindex(range(len(products)))
         for comp_name in competitor_names:
-            if comp_name in prices_by_competitor:
-                cp = prices_by_competitor[comp_name]
-                if cp.has_discount and cp.regular_price and cp.discount_price:
-                    row[comp_name] = f"{float(cp.regular_price):.2f} \\ {float(cp.discount_price):.2f}"
-                elif cp.price:
-                    row[comp_name] = f"{float(cp.price):.2f}"
-                else:
-                    row[comp_name] = '-'
-            else:
-                row[comp_name] = '-'
-        
-        comparison_rows.append(row)
-    
-    # Create DataFrame for main comparison
-    comparison_df = pd.DataFrame(comparison_rows)
-    
-    # Create Excel in memory
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Main comparison sheet
-        comparison_df.to_excel(writer, sheet_name='Price Comparison', index=False)
+            for field in PRICE_FIELDS:
+                prices_df[price_column(comp_name, field)] = wide[(field, comp_name)].astype(float).to_numpy()
+    prices_df = prices_df.reindex(columns=['Model'] + price_columns(competitor_names))
+    
+    # Main comparison sheet with "regular \\ discount" display strings
+    comparison_df = pd.concat([
+        pd.DataFrame({
+            'Quantity': [product.quantity or 0 for product in products],
+            'Model': prices_df['Model'],
+            'Product Name': [product.name or '-' for product in products],
+            'Our Price': [float(product.our_price) if product.our_price else 0.0 for product in products],
+        }),
+        format_display_prices(prices_df, competitor_names)
+    ], axis=1)
+    
+    def sheets():
+        """(sheet name, DataFrame) in workbook order, built one at a time"""
+        yield 'Price Comparison', comparison_df
         
         # Statistics sheet
         if statistics:
-            stats_data = {
-                'Total Products': [statistics.total_products or 0],
+            yield 'Statistics', pd.DataFrame({
+                'Total Products': [upload.total_products or 0],
                 'Total Value': [float(statistics.total_value) if statistics.total_value else 0.0],
-                'Avg Price': [float(statistics.avg_our_price) if statistics.avg_our_price else 0.0],
+                'Avg Price': [float(statistics.avg_price) if statistics.avg_price else 0.0],
                 'Products Cheaper': [statistics.products_cheaper or 0],
                 'Products Expensive': [statistics.products_expensive or 0],
                 'Products No Competitors': [statistics.products_no_competitors or 0],
-            }
-            stats_df = pd.DataFrame(stats_data)
-            stats_df.to_excel(writer, sheet_name='Statistics', index=False)
+            })
+        
+        # Machine-readable prices
+        yield PRICES_SHEET, prices_df
         
         # Individual competitor sheets
+        product_names = pd.Series([product.name or '-' for product in products], dtype=object)
         for comp_name in competitor_names:
-            comp_products = []
-            for product in products:
-                cp = CompetitorPrice.query.filter_by(
-                    product_id=product.id,
-                    competitor=comp_name
-                ).first()
-                
-                if cp:
-                    comp_row = {
-                        'Product Name': product.name or '-',
-                        'Price': float(cp.price) if cp.price else None,
-                        'Regular Price': float(cp.regular_price) if cp.regular_price else None,
-                        'Discount Price': float(cp.discount_price) if cp.discount_price else None,
-                        'Has Discount': cp.has_discount,
-                        'URL': cp.url or '-'
-                    }
-                    comp_products.append(comp_row)
-            
-            if comp_products:
-                comp_df = pd.DataFrame(comp_products)
-                comp_df.to_excel(writer, sheet_name=comp_name, index=False)
-    
+            comp_prices = competitor_prices[competitor_prices['competitor'] == comp_name]
+            yield comp_name, pd.DataFrame({
+                'Product Name': product_names.iloc[comp_prices['row']].to_numpy(),
+                'Price': comp_prices['price'].to_numpy(),
+                'Regular Price': comp_prices['regular_price'].to_numpy(),
+                'Discount Price': comp_prices['discount_price'].to_numpy(),
+                'Has Discount': comp_prices['has_discount'].to_numpy(),
+                'URL': comp_prices['url'].fillna('').replace('', '-').to_numpy(),
+            })
+    
+    # Create Excel in memory, streaming rows into a write-only workbook
+    output = BytesIO()
+    write_workbook(output, sheets())
     output.seek(0)
     return output
-
@@ -1,9 +1,17 @@
 """
 History service - uploads history and trends
 """
-from web_app.models import Upload, Product, CompetitorPrice, Statistic
+from web_app.models import Upload, Product, Statistic, CatalogProduct, PriceObservation
+from web_app.models.price_observation import OUR_SOURCE
 from web_app.database import db
-from sqlalchemy import func
+from sqlalchemy import func, select
+from datetime import datetime
+
+# Points (uploads) in the rolling minimum of price trends
+TREND_ROLLING_POINTS = 7
+
+# Models per bulk trends request
+TREND_SERIES_MAX_MODELS = 500
 
 def get_all_uploads():
     """
@@ -62,56 +70,218 @@ def get_upload_details(upload_id):
         'products_count': products_count
     }
 
-def get_price_trends(model):
+def get_price_trends(model, date_from=None, date_to=None):
     """
     Get price trends for a specific product model over time
     
+    One query over the price history fact table (price_observations): the
+    day-over-day change and the rolling minimum of each source (our price
+    and every competitor) are computed by SQL window functions. The windows
+    see the history before date_from, so the first point of a range has
+    its change too.
+    
     Args:
         model: Product model string
+        date_from: First date (YYYY-MM-DD, optional)
+        date_to: Last date (YYYY-MM-DD, optional)
     
     Returns:
         dict: price trends data
     """
-    # Get all products with this model
-    products = (
-        Product.query
-        .join(Upload, Product.upload_id == Upload.id)
-        .filter(Product.model == model)
-        .order_by(Upload.upload_date)
-        .all()
+    date_from, date_to = _parse_date(date_from), _parse_date(date_to)
+    
+    by_source = {'partition_by': PriceObservation.source, 'order_by': PriceObservation.date}
+    history = (
+        db.session.query(
+            CatalogProduct.name,
+            CatalogProduct.brand,
+            PriceObservation.date,
+            PriceObservation.source,
+            PriceObservation.price,
+            PriceObservation.regular_price,
+            PriceObservation.discount_price,
+            PriceObservation.quantity,
+            (PriceObservation.price - func.lag(PriceObservation.price).over(**by_source)).label('change'),
+            func.min(PriceObservation.price).over(rows=(-(TREND_ROLLING_POINTS - 1), 0), **by_source)
+            .label('rolling_min')
+        )
+        .join(CatalogProduct, CatalogProduct.id == PriceObservation.catalog_product_id)
+        .filter(CatalogProduct.model == CatalogProduct.canonical_model(model))
     )
+    if date_to:
+        history = history.filter(PriceObservation.date <= date_to)
+    history = history.subquery()
+    
+    query = db.session.query(history)
+    if date_from:
+        query = query.filter(history.c.date >= date_from)
+    observations = query.order_by(history.c.date, history.c.source).all()
     
-    if not products:
+    if not observations:
         raise Exception(f"No data found for model: {model}")
     
-    # Build trends data
-    trends = []
+    # Build trends data: one point per date, our row plus competitor rows
+    trends = {}
     
-    for product in products:
-        upload = Upload.query.get(product.upload_id)
-        competitor_prices = CompetitorPrice.query.filter_by(product_id=product.id).all()
+    for observation in observations:
+        point = trends.setdefault(observation.date, {
+            'date': observation.date.isoformat(),
+            'our_price': None,
+            'quantity': None,
+            'change': None,
+            'rolling_min': None,
+            'competitors': {}
+        })
         
-        # Organize competitor prices
-        competitors_data = {}
-        for cp in competitor_prices:
-            competitors_data[cp.competitor] = {
-                'price': float(cp.price),
-                'has_discount': cp.has_discount,
-                'regular_price': float(cp.regular_price) if cp.regular_price else None,
-                'discount_price': float(cp.discount_price) if cp.discount_price else None
+        if observation.source == OUR_SOURCE:
+            point['our_price'] = float(observation.price)
+            point['quantity'] = observation.quantity
+            point['change'] = _round_price(observation.change)
+            point['rolling_min'] = _round_price(observation.rolling_min)
+        else:
+            point['competitors'][observation.source] = {
+                'price': float(observation.price),
+                'has_discount': observation.discount_price is not None,
+                'regular_price': float(observation.regular_price) if observation.regular_price else None,
+                'discount_price': float(observation.discount_price) if observation.discount_price else None,
+                'change': _round_price(observation.change),
+                'rolling_min': _round_price(observation.rolling_min)
             }
-        
-        trends.append({
-            'date': upload.upload_date.isoformat(),
-            'our_price': float(product.our_price),
-            'quantity': product.quantity,
-            'competitors': competitors_data
-        })
     
     return {
         'model': model,
-        'name': products[0].name if products else None,
-        'brand': products[0].brand if products else None,
-        'trends': trends
+        'name': observations[0].name,
+        'brand': observations[0].brand,
+        'trends': list(trends.values())
     }
 
+def get_price_trend_series(models, date_from=None, date_to=None, points=None):
+    """
+    Aligned price series of many product models (bulk trends)
+    
+    All series share one date axis - every date in the range with a price
+    of any of the models. With more dates than points, consecutive dates
+    are grouped into `points` buckets and each series reports the minimum
+    and maximum price of a bucket (bucket min/max keeps price spikes and,
+    unlike LTTB, the same dates for every series). Three queries, however
+    many models: catalog products, the date axis, the bucketed prices.
+    
+    Args:
+        models: Product model strings
+        date_from: First date (YYYY-MM-DD, optional)
+        date_to: Last date (YYYY-MM-DD, optional)
+        points: Maximum points per series (optional, default: every date)
+    
+    Returns:
+        dict: dates (first date of each point), downsampled flag, series by
+            model ({name, brand, our_price: {min, max}, competitors:
+            {source: {min, max}}}, None where a source has no price) and
+            models without data
+    """
+    date_from, date_to = _parse_date(date_from), _parse_date(date_to)
+    requested = {}  # Canonical model -> model as requested
+    for model in models:
+        if model.strip():
+            requested.setdefault(CatalogProduct.canonical_model(model), model.strip())
+    models = list(requested.values())
+    
+    if not models:
+        raise Exception("No models given")
+    if len(models) > TREND_SERIES_MAX_MODELS:
+        raise Exception(f"Too many models: {len(models)} (at most {TREND_SERIES_MAX_MODELS})")
+    if points is not None and points < 1:
+        raise Exception(f"Invalid number of points: {points}")
+    
+    products = (
+        db.session.query(CatalogProduct.id, CatalogProduct.model, CatalogProduct.name, CatalogProduct.brand)
+        .filter(CatalogProduct.model.in_(list(requested)))
+        .all()
+    )
+    
+    observations = PriceObservation.query.filter(
+        PriceObservation.catalog_product_id.in_([product.id for product in products])
+    )
+    if date_from:
+        observations = observations.filter(PriceObservation.date >= date_from)
+    if date_to:
+        observations = observations.filter(PriceObservation.date <= date_to)
+    
+    # Date axis shared by all series
+    dates = [row.date for row in (
+        observations.with_entities(PriceObservation.date).distinct().order_by(PriceObservation.date)
+    )] if products else []
+    
+    downsampled = points is not None and len(dates) > points
+    buckets = points if downsampled else len(dates)
+    
+    # Date index by dense rank over the same rows, so buckets match the axis
+    ranked = observations.with_entities(
+        PriceObservation.catalog_product_id,
+        PriceObservation.source,
+        PriceObservation.price,
+        (func.dense_rank().over(order_by=PriceObservation.date) - 1).label('position')
+    ).subquery()
+    bucket = (ranked.c.position * buckets // len(dates)) if downsampled else ranked.c.position
+    
+    series = {}
+    for product in products:
+        series[requested[product.model]] = {
+            'name': product.name,
+            'brand': product.brand,
+            'our_price': _empty_series(buckets),
+            'competitors': {}
+        }
+    model_by_product = {product.id: requested[product.model] for product in products}
+    
+    if dates:
+        # Core select of rounded float aggregates - no ORM rows or Decimals
+        # for results of hundreds of thousands of rows
+        rows = db.session.connection().execute(
+            select(
+                ranked.c.catalog_product_id,
+                ranked.c.source,
+                bucket,
+                func.round(func.min(ranked.c.price), 2, type_=db.Float),
+                func.round(func.max(ranked.c.price), 2, type_=db.Float)
+            ).group_by(ranked.c.catalog_product_id, ranked.c.source, bucket)
+        )
+        key = None
+        for catalog_product_id, source, position, min_price, max_price in rows:
+            if (catalog_product_id, source) != key:
+                key = (catalog_product_id, source)
+                model_series = series[model_by_product[catalog_product_id]]
+                if source == OUR_SOURCE:
+                    values = model_series['our_price']
+                else:
+                    values = model_series['competitors'].setdefault(source, _empty_series(buckets))
+                min_values, max_values = values['min'], values['max']
+            min_values[position] = min_price
+            max_values[position] = max_price
+    
+    # First date of each point
+    if downsampled:
+        dates = [dates[(i * len(dates) + buckets - 1) // buckets] for i in range(buckets)]
+    
+    return {
+        'dates': [day.isoformat() for day in dates],
+        'downsampled': downsampled,
+        'series': series,
+        'missing': [model for model in models if model not in series]
+    }
+
+def _empty_series(points):
+    """Min/max value lists of a series without prices"""
+    return {'min': [None] * points, 'max': [None] * points}
+
+def _parse_date(date_str):
+    """Date of a YYYY-MM-DD string (None for an empty one)"""
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        raise Exception(f"Invalid date format: {date_str}")
+
+def _round_price(value):
+    """Price computed in SQL as a float rounded to cents (None stays None)"""
+    return None if value is None else round(float(value), 2)
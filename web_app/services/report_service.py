@@ -11,6 +11,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from web_app.models import Upload, Product, CompetitorPrice, Statistic
 from web_app.database import db
+from utils.price_matrix import PriceMatrix
 
 def generate_pdf_report(upload_id):
     """
@@ -127,20 +128,30 @@ def _analyze_competitiveness(products):
         'opportunities': []
     }
     
-    for product in products:
-        competitor_prices = CompetitorPrice.query.filter_by(product_id=product.id).all()
-        
-        if not competitor_prices:
-            continue
-        
-        prices = [float(cp.price) for cp in competitor_prices if cp.price]
-        if not prices:
+    # All competitor prices of these products in one query
+    row_by_product = {product.id: row for row, product in enumerate(products)}
+    price_rows = (
+        db.session.query(CompetitorPrice.product_id, CompetitorPrice.competitor, CompetitorPrice.price)
+        .filter(CompetitorPrice.product_id.in_(list(row_by_product)))
+        .all()
+    ) if products else []
+    
+    matrix = PriceMatrix.from_rows(
+        [product.model for product in products],
+        [(row_by_product[product_id], competitor, price or None, None, None)
+         for product_id, competitor, price in price_rows],
+        our_price=[float(product.our_price) if product.our_price else 0 for product in products],
+    )
+    has_prices = matrix.competitor_count() > 0
+    min_prices, avg_prices = matrix.min(), matrix.mean()
+    
+    for row, product in enumerate(products):
+        if not has_prices[row]:
             continue
         
-        our_price = float(product.our_price) if product.our_price else 0
-        min_competitor = min(prices)
-        max_competitor = max(prices)
-        avg_competitor = sum(prices) / len(prices)
+        our_price = float(matrix.our_price[row])
+        min_competitor = float(min_prices[row])
+        avg_competitor = float(avg_prices[row])
         
         # Check if we are cheaper
         if our_price < min_competitor:
@@ -0,0 +1,55 @@
+"""
+Upload queue - runs upload ingestion outside the request
+Jobs run on a background worker thread of the web process; their state is
+the Upload row (status processing/completed/failed), so any gunicorn worker
+can answer status polls
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# One ingest at a time per process - a day has one upload and re-uploads replace it
+UPLOAD_WORKERS = 1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def enqueue(app, func, *args):
+    """
+    Run func(*args) in an app context on the upload worker
+
+    With UPLOAD_ASYNC disabled (tests, one-off scripts) the job runs inline.
+
+    Args:
+        app: Flask application (current_app._get_current_object())
+        func: Job function
+        *args: Job arguments
+
+    Returns:
+        Future: completes when the job has finished
+    """
+    def run():
+        with app.app_context():
+            try:
+                return func(*args)
+            except Exception as e:
+                # Job functions record their failure (Upload.status) themselves
+                app.logger.error(f"Upload job {func.__name__}{args} failed: {e}")
+                raise
+
+    if not app.config.get('UPLOAD_ASYNC', True):
+        future = Future()
+        try:
+            future.set_result(run())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    return _get_executor().submit(run)
+
+def _get_executor():
+    """Worker pool, created on first use (after gunicorn forks)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='upload')
+        return _executor
@@ -1,75 +1,273 @@
 """
 Upload service - process Excel file uploads
 """
+import csv
+import io
+import numpy as np
+from collections import Counter
+from decimal import Decimal
 import pandas as pd
-from datetime import datetime, date
-from web_app.models import Upload, Product, CompetitorPrice, Statistic, User
+from datetime import datetime, date, timedelta
+from web_app.models import Upload, Product, CompetitorPrice, Statistic, CatalogProduct, PriceObservation
+from web_app.models.price_observation import OUR_SOURCE
 from web_app.database import db
+from sqlalchemy import bindparam, delete, insert, update
+from utils.price_columns import COMPETITORS, PRICES_SHEET, SOURCES, load_prices
+from utils.price_matrix import PriceMatrix
+from web_app.services.upload_queue import enqueue
+from web_app.utils.response_cache import response_cache
+from flask import current_app
+from openpyxl import load_workbook
 from werkzeug.utils import secure_filename
-import os
+import hashlib
+import tempfile
 
-def process_upload(file, user_id=None):
+try:
+    import pyarrow  # noqa: F401 - pandas Parquet engine
+except ImportError:  # Parquet uploads are not accepted without pyarrow
+    pyarrow = None
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Accepted upload payloads, most compact first: Content-Type -> stored file suffix
+# CSV/Parquet/NDJSON carry the comparison as one table - the 'Price Comparison'
+# columns plus numeric <SOURCE>_regular/_discount/_final columns; CSV and NDJSON
+# are usually gzip-compressed
+UPLOAD_FORMATS = {
+    'text/csv': '.csv',
+    **({'application/vnd.apache.parquet': '.parquet'} if pyarrow is not None else {}),
+    'application/x-ndjson': '.ndjson',
+    XLSX_CONTENT_TYPE: '.xlsx',
+}
+
+# Sheet names the comparison is looked up by first (then by its header row)
+COMPARISON_SHEET_NAMES = ('Price Comparison', 'Comparison', 'COMPARISON', 'Price_Comparison')
+
+# A 'processing' upload older than this is left over from a killed worker
+UPLOAD_STALE_AFTER = timedelta(minutes=30)
+
+# Chunk size for saving (and hashing) uploaded files
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Uploads up to this size are kept in memory until ingested, larger ones
+# spill to an anonymous temporary file
+UPLOAD_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# Columns compared when a re-upload is merged into the existing rows
+PRODUCT_MERGE_COLUMNS = ('name', 'quantity', 'our_price', 'brand', 'competitor_count')
+COMPETITOR_PRICE_MERGE_COLUMNS = ('price', 'regular_price', 'discount_price', 'has_discount', 'url')
+PRICE_OBSERVATION_MERGE_COLUMNS = ('price', 'regular_price', 'discount_price', 'quantity')
+
+class UploadInProgress(Exception):
+    """Another upload of the same day is still being processed"""
+
+class UploadBaseMismatch(Exception):
+    """A delta upload was made against data the server no longer has - send the full file"""
+
+def upload_suffix(file):
+    """
+    Stored file suffix of an upload, by its Content-Type or else its file name
+    
+    Args:
+        file: FileStorage object from Flask request
+    
+    Returns:
+        str: suffix from UPLOAD_FORMATS, None if the format is not accepted
     """
-    Process uploaded Excel file
+    suffix = UPLOAD_FORMATS.get(file.mimetype)
+    if suffix is None:
+        name = (file.filename or '').lower()
+        name = name[:-len('.gz')] if name.endswith('.gz') else name
+        suffix = next((s for s in UPLOAD_FORMATS.values() if name.endswith(s)), None)
+    return suffix
+
+def process_upload(file, user_id=None, content_hash=None, delta=None):
+    """
+    Process uploaded Excel file (synchronously, inside the request)
     
     Args:
         file: FileStorage object from Flask request
         user_id: ID of user who uploaded (optional, for API uploads)
+        content_hash: SHA-256 of the file announced by the uploader (optional)
+        delta: Delta upload - dict with base_hash and removed models (see accept_upload)
     
     Returns:
-        dict: upload result with statistics
+        dict: upload result with statistics ('duplicate': True if the file
+            was already uploaded today and nothing was changed)
+    """
+    upload, upload_file, suffix = accept_upload(file, user_id, content_hash, delta)
+    if upload_file is None:
+        return {
+            'upload_id': upload.id,
+            'upload_date': upload.upload_date.isoformat(),
+            'statistics': get_upload_status(upload.id).get('statistics'),
+            'duplicate': True
+        }
+    return ingest_upload(upload.id, upload_file, suffix, delta['removed'] if delta else None)
+
+def queue_upload(file, user_id=None, content_hash=None, delta=None):
+    """
+    Accept uploaded Excel file and process it in the background
+    
+    Args:
+        file: FileStorage object from Flask request
+        user_id: ID of user who uploaded (optional, for API uploads)
+        content_hash: SHA-256 of the file announced by the uploader (optional)
+        delta: Delta upload - dict with base_hash and removed models (see accept_upload)
+    
+    Returns:
+        dict: job status (see get_upload_status), status 'processing' - or
+            today's completed upload with 'duplicate': True if the file was
+            already uploaded
+    """
+    upload, upload_file, suffix = accept_upload(file, user_id, content_hash, delta)
+    if upload_file is None:
+        return {**get_upload_status(upload.id), 'duplicate': True}
+    
+    enqueue(current_app._get_current_object(), ingest_upload, upload.id, upload_file, suffix,
+            delta['removed'] if delta else None)
+    
+    # The job has its own session (app context) - reload what it may have changed
+    db.session.expire(upload)
+    return get_upload_status(upload.id)
+
+def accept_upload(file, user_id=None, content_hash=None, delta=None):
+    """
+    Store uploaded file and mark today's upload as processing
+    
+    The file is copied from the request stream into a SpooledTemporaryFile
+    (in memory up to UPLOAD_SPOOL_MAX_SIZE) that outlives the request, so a
+    queued ingest can still read it. The day's previous data stays in place
+    until ingest_upload() replaces it.
+    A file identical to today's completed upload (same SHA-256) is not stored
+    and nothing is written to the database.
+    
+    A delta upload carries only the rows of models changed since the upload
+    it was computed against (its base). It is accepted only while today's
+    completed upload still is that base; content_hash - the SHA-256 of the
+    full file the delta stands for - becomes the upload's hash.
+    
+    Args:
+        file: FileStorage object from Flask request
+        user_id: ID of user who uploaded (optional, for API uploads)
+        content_hash: SHA-256 of the file announced by the uploader - lets a
+            duplicate be recognised before the file is saved (optional,
+            required for a delta)
+        delta: Delta upload - dict with base_hash (SHA-256 of the base full
+            file) and removed (models deleted since the base); None for a full file
+    
+    Returns:
+        tuple: (Upload object, stored file - None for a duplicate, its
+            UPLOAD_FORMATS suffix)
     """
-    # Save file temporarily
     filename = secure_filename(file.filename)
-    temp_path = os.path.join('/tmp', filename)
-    file.save(temp_path)
+    suffix = upload_suffix(file)
+    if suffix is None:
+        raise Exception(f"Unsupported upload format: {file.mimetype or filename}")
+    
+    # Get today's date for this upload
+    upload_date = date.today()
+    
+    # Check if upload for today already exists
+    upload = Upload.query.filter_by(upload_date=upload_date).first()
+    
+    if upload and upload.status == 'processing' and upload.uploaded_at and \
+            datetime.utcnow() - upload.uploaded_at < UPLOAD_STALE_AFTER:
+        raise UploadInProgress(f"Upload for {upload_date.isoformat()} is already being processed")
+    
+    # Identical content announced by the uploader - nothing to store
+    if _is_duplicate(upload, content_hash):
+        return upload, None, suffix
+    
+    if delta is not None:
+        if not content_hash:
+            raise Exception("Delta upload without the hash of the full file")
+        if not _is_duplicate(upload, delta['base_hash']):
+            raise UploadBaseMismatch(f"Upload for {upload_date.isoformat()} is not the delta's base, send the full file")
+    
+    # Keep the file for ingest_upload (one per upload - uploads may overlap)
+    upload_file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        upload_file.write(chunk)
+    upload_file.seek(0)
+    if delta is not None:
+        # The upload now stands for the full file the delta was made from
+        content_hash = content_hash.lower()
+    else:
+        content_hash = digest.hexdigest()
     
+    if _is_duplicate(upload, content_hash):
+        upload_file.close()
+        return upload, None, suffix
+    
+    if upload:
+        # Update existing upload
+        upload.status = 'processing'
+        upload.uploaded_at = datetime.utcnow()
+        upload.file_name = filename
+        upload.error = None
+        upload.content_hash = content_hash
+    else:
+        # Create new upload
+        upload = Upload(
+            upload_date=upload_date,
+            uploaded_at=datetime.utcnow(),
+            uploaded_by=user_id,
+            file_name=filename,
+            total_products=0,
+            status='processing',
+            content_hash=content_hash
+        )
+        db.session.add(upload)
+    
+    db.session.commit()
+    response_cache.invalidate(upload.id)
+    
+    return upload, upload_file, suffix
+
+def _is_duplicate(upload, content_hash):
+    """Whether content_hash is that of the completed upload (its data is current)"""
+    return bool(upload and content_hash and upload.status == 'completed'
+                and upload.content_hash == content_hash.lower())
+
+def ingest_upload(upload_id, upload_file, suffix, removed_models=None):
+    """
+    Load a stored upload file into the database
+    
+    Merges the file into the upload's products, competitor prices and
+    statistics in one transaction (only changed rows are written) and sets
+    Upload.status to 'completed', or to 'failed' (with the error) on error.
+    
+    Args:
+        upload_id: Upload ID (from accept_upload)
+        upload_file: Stored file (from accept_upload), closed afterwards
+        suffix: Format of the stored file (UPLOAD_FORMATS suffix)
+        removed_models: Delta upload: models deleted since its base (the file
+            only has changed models, others are kept); None for a full file
+    
+    Returns:
+        dict: upload result with statistics
+    """
     try:
-        # Read Excel file
-        excel_data = pd.read_excel(temp_path, sheet_name=None)
+        upload = Upload.query.get(upload_id)
         
-        # Get today's date for this upload
-        upload_date = date.today()
+        # Read the comparison (and its numeric prices) only
+        main_sheet, prices_df = _read_upload_file(upload_file, suffix)
         
-        # Check if upload for today already exists
-        existing_upload = Upload.query.filter_by(upload_date=upload_date).first()
-        
-        if existing_upload:
-            # Update existing upload
-            upload = existing_upload
-            upload.status = 'processing'
-            upload.uploaded_at = datetime.utcnow()
-            upload.file_name = filename
-            
-            # Delete old products and related data (cascade will handle competitor_prices)
-            Product.query.filter_by(upload_id=upload.id).delete()
-            Statistic.query.filter_by(upload_id=upload.id).delete()
-            
-            db.session.commit()
-        else:
-            # Create new upload
-            upload = Upload(
-                upload_date=upload_date,
-                uploaded_at=datetime.utcnow(),
-                uploaded_by=user_id,
-                file_name=filename,
-                total_products=0,
-                status='processing'
-            )
-            db.session.add(upload)
-            db.session.commit()
+        # Everything below runs in one transaction: a failed upload leaves the
+        # previous data of the day untouched, readers see either version.
+        # A re-upload is merged into the day's rows (only changes are written)
         
         # Process data
-        result = _process_excel_data(excel_data, upload.id)
+        result = _process_excel_data(main_sheet, upload.id, prices_df, removed_models)
         
         # Update upload status
         upload.total_products = result['total_products']
         upload.status = 'completed'
         db.session.commit()
-        
-        # Clean up temp file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        response_cache.invalidate(upload.id)
         
         return {
             'upload_id': upload.id,
@@ -78,61 +276,226 @@ def process_upload(file, user_id=None):
         }
     
     except Exception as e:
-        # Clean up temp file on error
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        db.session.rollback()
         
-        # Update upload status to failed if upload exists
-        if 'upload' in locals():
+        # Update upload status to failed
+        upload = Upload.query.get(upload_id)
+        if upload:
             upload.status = 'failed'
+            upload.error = str(e)
             db.session.commit()
+            response_cache.invalidate(upload.id)
         
         raise e
+    
+    finally:
+        # Release the stored file (memory or its temporary file)
+        upload_file.close()
+
+def get_upload_status(upload_id):
+    """
+    Status of an upload job
+    
+    Args:
+        upload_id: Upload ID (the job id returned by queue_upload)
+    
+    Returns:
+        dict: job status with statistics once completed, None if not found
+    """
+    upload = Upload.query.get(upload_id)
+    
+    if not upload:
+        return None
+    
+    status = {
+        'job_id': upload.id,
+        'upload_id': upload.id,
+        'upload_date': upload.upload_date.isoformat(),
+        'status': upload.status,
+        'file_name': upload.file_name,
+        'uploaded_at': upload.uploaded_at.isoformat() if upload.uploaded_at else None,
+        'total_products': upload.total_products,
+        'error': upload.error
+    }
+    
+    statistic = upload.statistics
+    if upload.status == 'completed' and statistic:
+        status['statistics'] = {
+            'total_products': upload.total_products or 0,
+            'total_value': float(statistic.total_value) if statistic.total_value is not None else 0.0,
+            'avg_price': float(statistic.avg_price) if statistic.avg_price is not None else 0.0,
+            'products_cheaper': statistic.products_cheaper or 0,
+            'products_expensive': statistic.products_expensive or 0,
+            'products_no_competitors': statistic.products_no_competitors or 0,
+            'competitor_coverage': statistic.competitor_coverage,
+            'median_gap_pct': float(statistic.median_gap_pct) if statistic.median_gap_pct is not None else None
+        }
+    
+    return status
+
+def _read_upload_file(upload_file, suffix):
+    """
+    Read a stored upload file
+    
+    Args:
+        upload_file: Binary file object of the stored upload
+        suffix: Its format (UPLOAD_FORMATS suffix)
+    
+    Returns:
+        tuple: (comparison DataFrame, numeric prices DataFrame or None)
+    """
+    upload_file.seek(0)
+    if suffix == '.xlsx':
+        return _read_comparison_workbook(upload_file)
+    
+    # Gzip is detected from the content, the stored suffix has no .gz
+    compression = 'gzip' if upload_file.read(2) == b'\x1f\x8b' else None
+    upload_file.seek(0)
+    
+    if suffix == '.parquet':
+        table = pd.read_parquet(upload_file)
+    elif suffix == '.ndjson':
+        # Keep JSON types as sent (model numbers stay strings)
+        table = pd.read_json(upload_file, lines=True, dtype=False, convert_dates=False, compression=compression)
+    else:
+        table = pd.read_csv(upload_file, dtype={'Model': str, 'Product Name': str}, compression=compression)
+    
+    # One table carries both the comparison and its numeric price columns
+    return table, table
+
+def _read_comparison_workbook(upload_file):
+    """
+    Read the comparison sheet of an uploaded workbook
+    
+    The workbook is opened in read-only mode: sheets are parsed lazily, row by
+    row. Header rows are looked at to find the comparison sheet, then only that
+    sheet and the 'Prices' sheet are read - the per-source and INVENTORY sheets
+    are never parsed. (Opening sizes every sheet from its stored dimensions,
+    which write_workbook output has.)
+    
+    Args:
+        upload_file: Path or binary file object of the .xlsx file
+    
+    Returns:
+        tuple: (comparison sheet DataFrame, 'Prices' sheet DataFrame or None)
+    """
+    wb = load_workbook(upload_file, read_only=True, data_only=True)
+    try:
+        sheets = {ws.title: ws for ws in wb.worksheets}
+        if not sheets:
+            raise Exception("Excel file has no worksheets")
+        
+        # Choose the correct comparison sheet
+        # Prefer explicit names, otherwise pick the first sheet that has the required columns
+        main_name = next((name for name in sheets if name in COMPARISON_SHEET_NAMES), None)
+        if main_name is None:
+            # Find a sheet that contains at least Model and Our Price columns
+            for name, ws in sheets.items():
+                header = next(ws.iter_rows(max_row=1, values_only=True), ())
+                cols = {str(c).strip() for c in header if c is not None}
+                if {'Model', 'Our Price'}.issubset(cols):
+                    main_name = name
+                    break
+        if main_name is None:
+            # Fallback to the first sheet
+            main_name = next(iter(sheets))
+        
+        main_sheet = _read_sheet(sheets[main_name])
+        prices_df = _read_sheet(sheets[PRICES_SHEET]) if PRICES_SHEET in sheets else None
+    finally:
+        wb.close()
+    
+    return main_sheet, prices_df
 
-def _process_excel_data(excel_data, upload_id):
+def _read_sheet(ws):
     """
-    Process Excel sheets and extract data
+    Read a read-only worksheet into a DataFrame like pd.read_excel does
+    (first row is the header, integral floats become ints, trailing empty rows dropped)
+    """
+    # Stored dimensions may be missing or wrong (depends on the writing tool) -
+    # read rows to the end of the sheet data instead
+    ws.reset_dimensions()
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, ())
+    columns = [
+        str(value) if value is not None else f'Unnamed: {i}'
+        for i, value in enumerate(header)
+    ]
+    
+    records = []
+    last_data_row = 0
+    for row in rows:
+        record = [
+            int(value) if isinstance(value, float) and value.is_integer() else value
+            for value in row[:len(columns)]
+        ]
+        record += [None] * (len(columns) - len(record))
+        records.append(record)
+        if any(value is not None for value in record):
+            last_data_row = len(records)
+    
+    return pd.DataFrame(records[:last_data_row], columns=columns)
+
+def _process_excel_data(main_sheet, upload_id, prices_df=None, removed_models=None):
+    """
+    Process the comparison sheet and extract data
     
     Args:
-        excel_data: dict of DataFrames (sheet_name: DataFrame)
+        main_sheet: 'Price Comparison' sheet DataFrame
         upload_id: Upload ID
+        prices_df: 'Prices' sheet DataFrame (numeric prices) if the workbook has one
+        removed_models: Delta upload: models deleted since its base (None: full file)
     
     Returns:
         dict: processing result
     """
-    # Choose the correct comparison sheet
-    # Prefer explicit names, otherwise pick the first sheet that has the required columns
-    preferred_names = {'Price Comparison', 'Comparison', 'COMPARISON', 'Price_Comparison'}
-    main_sheet = None
-    for name, df in excel_data.items():
-        if name in preferred_names:
-            main_sheet = df
-            break
-    if main_sheet is None:
-        # Find a sheet that contains at least Model and Our Price columns
-        for df in excel_data.values():
-            cols = {str(c).strip() for c in df.columns}
-            if {'Model', 'Our Price'}.issubset(cols):
-                main_sheet = df
-                break
-    if main_sheet is None:
-        # Fallback to the first sheet
-        main_sheet = list(excel_data.values())[0]
-    
-    # Process main comparison data
-    products_data = _parse_comparison_sheet(main_sheet, upload_id)
-    
-    # Calculate statistics
-    statistics = _calculate_statistics(products_data, upload_id)
+    # Process main comparison data (numeric prices from the 'Prices' sheet if present)
+    products_data, matrix = _parse_comparison_sheet(main_sheet, upload_id, prices_df, removed_models)
+    
+    if removed_models is not None:
+        # A delta only has the changed products - statistics need all of them
+        matrix = _upload_price_matrix(upload_id)
+    
+    # Calculate statistics from the parsed prices (no re-query for a full file)
+    statistics = _calculate_statistics(matrix, upload_id)
+    
+    # Price history of the day (what trends read)
+    _record_price_observations(upload_id, matrix)
     
     return {
-        'total_products': len(products_data),
+        'total_products': len(matrix),
         'statistics': statistics
     }
 
-def _parse_comparison_sheet(df, upload_id):
+def _upload_price_matrix(upload_id):
+    """PriceMatrix of all stored products of an upload (two queries)"""
+    products = (
+        db.session.query(Product.id, Product.model, Product.our_price, Product.quantity)
+        .filter(Product.upload_id == upload_id)
+        .order_by(Product.id)
+        .all()
+    )
+    row_by_product = {product.id: row for row, product in enumerate(products)}
+    price_rows = (
+        db.session.query(CompetitorPrice.product_id, CompetitorPrice.competitor, CompetitorPrice.price,
+                         CompetitorPrice.regular_price, CompetitorPrice.discount_price)
+        .join(Product, Product.id == CompetitorPrice.product_id)
+        .filter(Product.upload_id == upload_id)
+        .all()
+    )
+    
+    return PriceMatrix.from_rows(
+        [product.model for product in products],
+        [(row_by_product[product_id], competitor, price, regular_price, discount_price)
+         for product_id, competitor, price, regular_price, discount_price in price_rows],
+        SOURCES,
+        our_price=[product.our_price for product in products],
+        quantity=[product.quantity for product in products],
+    )
+
+def _parse_comparison_sheet(df, upload_id, prices_df=None, removed_models=None):
     """
-    Parse Price Comparison sheet
+    Parse Price Comparison sheet and bulk-insert products and competitor prices
     
     Expected columns:
     - Model
@@ -141,105 +504,363 @@ def _parse_comparison_sheet(df, upload_id):
     - Quantity
     - DIM_KAVA, ALTA, KONTAKT, ELITE, COFFEEHUB, COFFEEPIN, VELI_STORE, VEGA_GE (competitor columns)
     
+    All rows are built in memory, then merged into the upload's existing rows
+    (none for a first upload): new products go in with one batched INSERT ...
+    RETURNING id, new competitor prices with one executemany (COPY on
+    PostgreSQL); changed rows are updated and rows missing from the file are
+    deleted, each with one executemany. Nothing is committed - the caller
+    owns the transaction.
+    
     Args:
         df: DataFrame with comparison data
         upload_id: Upload ID
+        prices_df: 'Prices' sheet with numeric <SOURCE>_regular/_discount/_final
+            columns (older workbooks: None, display strings are parsed instead)
+        removed_models: Delta upload: models deleted since its base - only
+            these and the file's models are merged, other products are kept
+            (None: full file, products missing from it are deleted)
     
     Returns:
-        list: processed products
+        tuple: (processed products - dicts with id, model, our_price, quantity,
+            competitor_count; PriceMatrix of their competitor prices)
     """
-    products_data = []
-    
     # Clean column names
     df.columns = df.columns.str.strip()
     
-    # Competitor columns
-    competitor_columns = ['DIM_KAVA', 'ALTA', 'KONTAKT', 'ELITE', 'COFFEEHUB', 'COFFEEPIN', 'VELI_STORE', 'VEGA_GE']
-    
-    for idx, row in df.iterrows():
-        try:
-            # Skip empty rows
-            if pd.isna(row.get('Model')) or pd.isna(row.get('Our Price')):
-                continue
-            
-            model = str(row['Model']).strip()
-            name = str(row.get('Product Name', model))
-            our_price = float(row['Our Price'])
-            quantity = int(row.get('Quantity', 0))
-            
-            # Determine brand from model
-            brand = _determine_brand(model, name)
-            
-            # Create product
-            product = Product(
-                upload_id=upload_id,
-                model=model,
-                name=name,
-                quantity=quantity,
-                our_price=our_price,
-                brand=brand
-            )
-            
-            db.session.add(product)
-            db.session.flush()  # Get product.id
-            
-            # Process competitor prices
-            competitor_count = 0
-            
-            for competitor in competitor_columns:
-                if competitor not in df.columns:
-                    continue
-                
-                price_value = row.get(competitor)
-                
-                if pd.isna(price_value) or price_value == '-':
-                    continue
-                
-                # Parse price (can be "123.45" or "150.00 \ 120.00" for discount)
-                price_str = str(price_value).strip()
-                
-                if '\\' in price_str:
-                    # Has discount
-                    parts = price_str.split('\\')
-                    regular_price = float(parts[0].strip())
-                    discount_price = float(parts[1].strip())
-                    price = discount_price
-                    has_discount = True
-                else:
-                    # No discount
-                    price = float(price_str)
-                    regular_price = price
-                    discount_price = None
-                    has_discount = False
-                
-                # Create competitor price
-                cp = CompetitorPrice(
-                    product_id=product.id,
-                    competitor=competitor,
-                    price=price,
-                    regular_price=regular_price,
-                    discount_price=discount_price,
-                    has_discount=has_discount,
-                    url=None  # URL not available in Excel
-                )
-                
-                db.session.add(cp)
-                competitor_count += 1
-            
-            product.competitor_count = competitor_count
-            
-            products_data.append({
-                'product': product,
-                'competitor_count': competitor_count
-            })
-        
-        except Exception as e:
-            print(f"Error processing row {idx}: {e}")
+    def column(name):
+        return df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+    
+    # Skip empty rows
+    our_prices = pd.to_numeric(column('Our Price'), errors='coerce')
+    valid = (column('Model').notna() & our_prices.notna()).to_numpy()
+    rows = df[valid]
+    
+    models = rows['Model'].astype(str).str.strip().tolist()
+    names = rows['Product Name'].astype(str).tolist() if 'Product Name' in rows.columns else models
+    quantities = pd.to_numeric(column('Quantity')[valid], errors='coerce').fillna(0).astype(int).tolist()
+    
+    # Numeric competitor prices (products × competitors)
+    matrix = PriceMatrix.from_prices(load_prices(df, prices_df)[valid], models, SOURCES,
+                                     our_prices[valid], quantities)
+    competitor_counts = matrix.competitor_count().tolist()
+    
+    products_data = [
+        {
+            'upload_id': upload_id,
+            'model': model,
+            'name': name,
+            'quantity': quantity,
+            'our_price': our_price,
+            'brand': _determine_brand(model, name),
+            'competitor_count': competitor_count
+        }
+        for model, name, quantity, our_price, competitor_count in zip(
+            models, names, quantities, matrix.our_price.tolist(), competitor_counts
+        )
+    ]
+    
+    if not products_data:
+        return [], matrix
+    
+    # Products: ids of kept products, new ones inserted (ids in row order)
+    scope = None if removed_models is None else set(models) | set(removed_models)
+    product_ids = _merge_products(upload_id, products_data, scope)
+    for product, product_id in zip(products_data, product_ids):
+        product['id'] = product_id
+    
+    # Competitor prices: every (product, competitor) cell that has a price
+    regular = np.where(np.isnan(matrix.regular), matrix.final, matrix.regular)
+    competitor_prices = [
+        {
+            'product_id': product_ids[row],
+            'competitor': SOURCES[col],
+            'price': float(matrix.final[row, col]),
+            'regular_price': float(regular[row, col]),
+            'discount_price': float(matrix.discount[row, col]) if matrix.has_discount[row, col] else None,
+            'has_discount': bool(matrix.has_discount[row, col]),
+            'url': None  # URL not available in Excel
+        }
+        for row, col in zip(*np.nonzero(~np.isnan(matrix.final)))
+    ]
+    _merge_competitor_prices(upload_id, competitor_prices, None if scope is None else product_ids)
+    
+    return products_data, matrix
+
+def _merge_products(upload_id, rows, models=None):
+    """
+    Merge parsed products into the upload's existing products
+    
+    Products are matched on model (the n-th row of a model with the n-th
+    existing product of that model): changed ones are updated, new ones
+    inserted, products no longer in the file deleted with their prices.
+    
+    Args:
+        upload_id: Upload ID
+        rows: list of dicts with Product column values, in sheet order
+        models: Merge only existing products of these models (delta upload;
+            None: all products of the upload)
+    
+    Returns:
+        list: product id of each row
+    """
+    table = Product.__table__
+    existing = db.session.query(
+        Product.id, Product.model, *(getattr(Product, column) for column in PRODUCT_MERGE_COLUMNS)
+    ).filter(Product.upload_id == upload_id)
+    if models is not None:
+        existing = existing.filter(Product.model.in_(list(models)))
+    existing = existing.order_by(Product.id).all()
+    by_key = dict(zip(_occurrence_keys(product.model for product in existing), existing))
+    
+    product_ids = [None] * len(rows)
+    new_rows, changed = [], []
+    for i, (key, row) in enumerate(zip(_occurrence_keys(row['model'] for row in rows), rows)):
+        product = by_key.pop(key, None)
+        if product is None:
+            new_rows.append(i)
             continue
+        product_ids[i] = product.id
+        if _row_changed(product, row, PRODUCT_MERGE_COLUMNS):
+            changed.append({'b_id': product.id, **{column: row[column] for column in PRODUCT_MERGE_COLUMNS}})
     
-    db.session.commit()
+    removed = [product.id for product in by_key.values()]
+    if removed:
+        db.session.execute(delete(CompetitorPrice.__table__).where(CompetitorPrice.__table__.c.product_id.in_(removed)))
+        db.session.execute(delete(table).where(table.c.id.in_(removed)))
     
-    return products_data
+    if changed:
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('b_id'))
+            .values({column: bindparam(column) for column in PRODUCT_MERGE_COLUMNS}),
+            changed
+        )
+    
+    if new_rows:
+        # One batched INSERT ... RETURNING id (ids in row order)
+        new_ids = db.session.scalars(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            [rows[i] for i in new_rows]
+        ).all()
+        for i, product_id in zip(new_rows, new_ids):
+            product_ids[i] = product_id
+    
+    current_app.logger.info(
+        f"Upload {upload_id} products: {len(new_rows)} new, {len(changed)} changed, {len(removed)} removed"
+    )
+    return product_ids
+
+def _merge_competitor_prices(upload_id, rows, product_ids=None):
+    """
+    Merge parsed competitor prices into the upload's existing prices
+    
+    Prices are matched on (product_id, competitor): changed ones are updated,
+    new ones inserted, prices no longer in the file deleted.
+    
+    Args:
+        upload_id: Upload ID
+        rows: list of dicts with CompetitorPrice column values
+        product_ids: Merge only existing prices of these products (delta
+            upload; None: all products of the upload)
+    """
+    table = CompetitorPrice.__table__
+    existing = db.session.query(
+        CompetitorPrice.id, CompetitorPrice.product_id, CompetitorPrice.competitor,
+        *(getattr(CompetitorPrice, column) for column in COMPETITOR_PRICE_MERGE_COLUMNS)
+    ).join(Product, Product.id == CompetitorPrice.product_id).filter(Product.upload_id == upload_id)
+    if product_ids is not None:
+        existing = existing.filter(CompetitorPrice.product_id.in_(product_ids))
+    existing = existing.all()
+    
+    by_key, removed = {}, []
+    for price in existing:
+        key = (price.product_id, price.competitor)
+        if key in by_key:
+            removed.append(price.id)  # Duplicate left by an older upload
+        else:
+            by_key[key] = price
+    
+    new_rows, changed = [], []
+    for row in rows:
+        price = by_key.pop((row['product_id'], row['competitor']), None)
+        if price is None:
+            new_rows.append(row)
+        elif _row_changed(price, row, COMPETITOR_PRICE_MERGE_COLUMNS):
+            changed.append({'b_id': price.id, **{column: row[column] for column in COMPETITOR_PRICE_MERGE_COLUMNS}})
+    removed += [price.id for price in by_key.values()]
+    
+    if removed:
+        db.session.execute(delete(table).where(table.c.id.in_(removed)))
+    
+    if changed:
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('b_id'))
+            .values({column: bindparam(column) for column in COMPETITOR_PRICE_MERGE_COLUMNS}),
+            changed
+        )
+    
+    _bulk_insert(CompetitorPrice.__table__, new_rows)
+    
+    current_app.logger.info(
+        f"Upload {upload_id} competitor prices: {len(new_rows)} new, {len(changed)} changed, {len(removed)} removed"
+    )
+
+def _occurrence_keys(models):
+    """(model, n) for each model - n counts earlier rows of the same model"""
+    seen = Counter()
+    for model in models:
+        yield model, seen[model]
+        seen[model] += 1
+
+def _row_changed(existing, row, columns):
+    """Whether any column of a stored row differs from the parsed row (prices to the cent)"""
+    for column in columns:
+        old, new = getattr(existing, column), row[column]
+        if isinstance(old, Decimal) and new is not None:
+            if round(float(old), 2) != round(float(new), 2):
+                return True
+        elif old != new:
+            return True
+    return False
+
+def _record_price_observations(upload_id, matrix):
+    """
+    Bring the upload date's rows of the price history (fact) table up to date
+    
+    Models new to catalog_products are added and the name/brand of known
+    ones refreshed; the date's price_observations are rewritten - our price
+    and quantity under OUR_SOURCE plus one row per competitor price - are
+    merged like products (changed rows updated, missing ones deleted). A
+    model listed twice keeps its first row. Nothing is committed.
+    
+    Args:
+        upload_id: Upload ID
+        matrix: PriceMatrix of all products of the upload
+    """
+    upload_date = db.session.get(Upload, upload_id).upload_date
+    
+    # Product details of the upload by canonical model (first product wins)
+    details = {}
+    for product in (
+        db.session.query(Product.model, Product.name, Product.brand)
+        .filter(Product.upload_id == upload_id)
+        .order_by(Product.id)
+    ):
+        details.setdefault(CatalogProduct.canonical_model(product.model), product)
+    
+    rows = {}
+    for row, model in enumerate(matrix.models):
+        rows.setdefault(CatalogProduct.canonical_model(model), row)
+    
+    # Catalog: insert new models, refresh changed names/brands
+    table = CatalogProduct.__table__
+    catalog = {product.model: product for product in
+               db.session.query(CatalogProduct.id, CatalogProduct.model, CatalogProduct.name, CatalogProduct.brand)}
+    new_models = [model for model in rows if model not in catalog and model in details]
+    changed = [
+        {'b_id': catalog[model].id, 'name': details[model].name, 'brand': details[model].brand}
+        for model in rows
+        if model in catalog and model in details
+        and (catalog[model].name, catalog[model].brand) != (details[model].name, details[model].brand)
+    ]
+    if changed:
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('b_id')).values(name=bindparam('name'), brand=bindparam('brand')),
+            changed
+        )
+    catalog_ids = {model: product.id for model, product in catalog.items()}
+    if new_models:
+        new_ids = db.session.scalars(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            [{'model': model, 'name': details[model].name, 'brand': details[model].brand} for model in new_models]
+        ).all()
+        catalog_ids.update(zip(new_models, new_ids))
+    
+    # Observations of the day, merged into the stored ones (only changes are written)
+    observations = []
+    regular = np.where(np.isnan(matrix.regular), matrix.final, matrix.regular)
+    for model, row in rows.items():
+        if model not in catalog_ids:
+            continue
+        catalog_product_id = catalog_ids[model]
+        our_price = float(matrix.our_price[row])
+        observations.append({
+            'catalog_product_id': catalog_product_id, 'date': upload_date, 'source': OUR_SOURCE,
+            'price': our_price, 'regular_price': our_price, 'discount_price': None,
+            'quantity': int(matrix.quantity[row]),
+        })
+        for col in np.nonzero(~np.isnan(matrix.final[row]))[0]:
+            observations.append({
+                'catalog_product_id': catalog_product_id, 'date': upload_date, 'source': matrix.sources[col],
+                'price': float(matrix.final[row, col]),
+                'regular_price': float(regular[row, col]),
+                'discount_price': float(matrix.discount[row, col]) if matrix.has_discount[row, col] else None,
+                'quantity': None,
+            })
+    
+    table = PriceObservation.__table__
+    existing = {
+        (observation.catalog_product_id, observation.source): observation
+        for observation in db.session.query(
+            PriceObservation.catalog_product_id, PriceObservation.source,
+            *(getattr(PriceObservation, column) for column in PRICE_OBSERVATION_MERGE_COLUMNS)
+        ).filter(PriceObservation.date == upload_date)
+    }
+    new_rows, changed = [], []
+    for row in observations:
+        observation = existing.pop((row['catalog_product_id'], row['source']), None)
+        if observation is None:
+            new_rows.append(row)
+        elif _row_changed(observation, row, PRICE_OBSERVATION_MERGE_COLUMNS):
+            changed.append({'b_catalog_product_id': row['catalog_product_id'], 'b_source': row['source'],
+                            **{column: row[column] for column in PRICE_OBSERVATION_MERGE_COLUMNS}})
+    
+    key = (table.c.catalog_product_id == bindparam('b_catalog_product_id')) & \
+        (table.c.date == upload_date) & (table.c.source == bindparam('b_source'))
+    if existing:
+        db.session.execute(delete(table).where(key), [
+            {'b_catalog_product_id': catalog_product_id, 'b_source': source}
+            for catalog_product_id, source in existing
+        ])
+    if changed:
+        db.session.execute(
+            update(table).where(key).values({column: bindparam(column) for column in PRICE_OBSERVATION_MERGE_COLUMNS}),
+            changed
+        )
+    _bulk_insert(table, new_rows)
+
+def _bulk_insert(table, rows):
+    """
+    Insert rows into a table in the current transaction
+    
+    Uses COPY on PostgreSQL (psycopg2), executemany elsewhere.
+    
+    Args:
+        table: Table (Model.__table__)
+        rows: list of dicts with column values, all with the same keys
+    """
+    if not rows:
+        return
+    
+    connection = db.session.connection()
+    dbapi_connection = connection.connection.dbapi_connection
+    
+    if connection.dialect.name == 'postgresql' and hasattr(dbapi_connection, 'cursor'):
+        cursor = dbapi_connection.cursor()
+        if hasattr(cursor, 'copy_expert'):
+            columns = list(rows[0])
+            buffer = io.StringIO()
+            # Unquoted empty CSV fields are NULL
+            csv.writer(buffer).writerows([row[c] for c in columns] for row in rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            cursor.close()
+            return
+    
+    # Core insert: ORM bulk mode would split batches on differing NULL columns
+    db.session.execute(insert(table), rows)
 
 def _determine_brand(model, name):
     """
@@ -263,76 +884,65 @@ def _determine_brand(model, name):
     else:
         return 'Unknown'
 
-def _calculate_statistics(products_data, upload_id):
+def _calculate_statistics(matrix, upload_id):
     """
     Calculate statistics for upload
     
     Args:
-        products_data: list of products with data
+        matrix: PriceMatrix of the parsed products (float prices, our price, quantity)
         upload_id: Upload ID
     
     Returns:
         dict: statistics
     """
-    total_products = len(products_data)
+    total_products = len(matrix)
     
     if total_products == 0:
+        Statistic.query.filter_by(upload_id=upload_id).delete()
         return {}
     
     # Calculate totals
-    total_value = sum(p['product'].our_price * p['product'].quantity for p in products_data)
-    avg_price = sum(p['product'].our_price for p in products_data) / total_products
-    
-    prices = [p['product'].our_price for p in products_data]
-    min_price = min(prices)
-    max_price = max(prices)
-    
-    # Count products by competitor count
-    products_with_1_plus = sum(1 for p in products_data if p['competitor_count'] >= 1)
-    products_with_2_plus = sum(1 for p in products_data if p['competitor_count'] >= 2)
-    products_with_3_plus = sum(1 for p in products_data if p['competitor_count'] >= 3)
+    total_value = float((matrix.our_price * matrix.quantity).sum())
+    avg_price = float(matrix.our_price.mean())
     
     # Count cheaper/more expensive products
-    products_cheaper = 0
-    products_expensive = 0
-    products_no_competitors = 0
+    has_competitors = matrix.competitor_count() > 0
+    products_no_competitors = int((~has_competitors).sum())
+    # Our price below / above at least one competitor
+    products_cheaper = int(matrix.cheaper_than_any().sum())
+    products_expensive = int(matrix.more_expensive_than_any().sum())
     
-    for p_data in products_data:
-        product = p_data['product']
-        competitors = CompetitorPrice.query.filter_by(product_id=product.id).all()
-        
-        if len(competitors) == 0:
-            products_no_competitors += 1
-            continue
-        
-        # Check if our price is cheaper than any competitor
-        is_cheaper = any(product.our_price < cp.price for cp in competitors)
-        is_expensive = any(product.our_price > cp.price for cp in competitors)
-        
-        if is_cheaper:
-            products_cheaper += 1
-        if is_expensive:
-            products_expensive += 1
+    # Share of products each competitor has a price for, %
+    competitor_coverage = {
+        competitor: round(share * 100, 1) for competitor, share in matrix.coverage().items()
+    }
+    
+    # Median gap of our price to the cheapest competitor (other shops, not our website), %
+    gaps = matrix.select(COMPETITORS).gap_to_min()
+    gaps = gaps[~np.isnan(gaps)]
+    median_gap_pct = round(float(np.median(gaps)) * 100, 2) if gaps.size else None
     
     # Persist statistics using fields that exist in the Statistic model
-    statistic = Statistic(
-        upload_id=upload_id,
-        total_value=total_value,
-        avg_price=avg_price,
-        products_cheaper=products_cheaper,
-        products_expensive=products_expensive,
-        products_no_competitors=products_no_competitors
-    )
+    # (a re-upload updates the day's row)
+    statistic = Statistic.query.filter_by(upload_id=upload_id).first() or Statistic(upload_id=upload_id)
+    statistic.total_value = total_value
+    statistic.avg_price = avg_price
+    statistic.products_cheaper = products_cheaper
+    statistic.products_expensive = products_expensive
+    statistic.products_no_competitors = products_no_competitors
+    statistic.competitor_coverage = competitor_coverage
+    statistic.median_gap_pct = median_gap_pct
     
     db.session.add(statistic)
-    db.session.commit()
+    db.session.flush()
     
     return {
         'total_products': total_products,
-        'total_value': float(total_value) if total_products else 0.0,
-        'avg_price': float(avg_price) if total_products else 0.0,
+        'total_value': total_value,
+        'avg_price': avg_price,
         'products_cheaper': products_cheaper,
         'products_expensive': products_expensive,
-        'products_no_competitors': products_no_competitors
+        'products_no_competitors': products_no_competitors,
+        'competitor_coverage': competitor_coverage,
+        'median_gap_pct': median_gap_pct
     }
-
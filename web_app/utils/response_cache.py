@@ -0,0 +1,167 @@
+"""
+Response cache - rendered pages of upload data
+Dashboard, comparison and history pages only change when an upload is
+accepted or ingested, so they are cached per upload generation (a token
+naming the last upload written) and language. Every process keeps an LRU of
+pages; with CACHE_REDIS_URL set, pages are also shared by all gunicorn
+workers through Redis. upload_service invalidates the cache (new
+generation) whenever it writes an upload.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request, session
+
+try:
+    import redis
+except ImportError:  # Shared cache disabled - every process caches on its own
+    redis = None
+
+REDIS_PREFIX = 'price_monitor:pages:'
+
+class ResponseCache:
+    """Per-process LRU of rendered pages with an optional Redis backend"""
+
+    def __init__(self, app=None):
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self.max_entries = 0
+        self.generation_file = None
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure from CACHE_* settings and register as app.extensions['response_cache']"""
+        self.max_entries = app.config.get('CACHE_MAX_ENTRIES', 32)
+        self.generation_file = app.config.get('CACHE_GENERATION_FILE')
+        self.ttl = app.config.get('CACHE_TTL', 24 * 60 * 60)
+        with self._lock:
+            self._pages.clear()  # Pages of another app (tests create several)
+
+        self._redis = None
+        url = app.config.get('CACHE_REDIS_URL')
+        if url and redis is None:
+            app.logger.warning("CACHE_REDIS_URL is set but redis is not installed - pages are cached per process")
+        elif url:
+            self._redis = redis.Redis.from_url(url, socket_timeout=1)
+
+        app.extensions['response_cache'] = self
+
+    def generation(self):
+        """
+        Token of the current upload data, the same in every worker
+
+        Kept in Redis when configured, otherwise in CACHE_GENERATION_FILE
+        (workers of one host share it); '0' before the first invalidation.
+        """
+        if self._redis is not None:
+            try:
+                value = self._redis.get(REDIS_PREFIX + 'generation')
+                return value.decode() if value else '0'
+            except redis.RedisError as e:
+                current_app.logger.warning(f"Response cache: Redis unavailable: {e}")
+
+        try:
+            with open(self.generation_file) as f:
+                return f.read().strip() or '0'
+        except (OSError, TypeError):
+            return '0'
+
+    def invalidate(self, upload_id):
+        """Start a new generation after upload upload_id was written - all cached pages expire"""
+        token = f'{upload_id}-{time.time_ns()}'
+
+        if self._redis is not None:
+            try:
+                self._redis.set(REDIS_PREFIX + 'generation', token)
+            except redis.RedisError as e:
+                current_app.logger.warning(f"Response cache: Redis unavailable: {e}")
+
+        if self.generation_file:
+            # Atomic replace - readers see the old or the new token
+            temp_path = f'{self.generation_file}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(token)
+            os.replace(temp_path, self.generation_file)
+
+        with self._lock:
+            self._pages.clear()
+
+    def get(self, key):
+        """Cached page or None"""
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                return page
+
+        if self._redis is not None:
+            try:
+                page = self._redis.get(REDIS_PREFIX + key)
+            except redis.RedisError as e:
+                current_app.logger.warning(f"Response cache: Redis unavailable: {e}")
+            if page is not None:
+                page = page.decode()
+                self._store(key, page)
+        return page
+
+    def set(self, key, page):
+        """Cache a page in this process (and in Redis)"""
+        self._store(key, page)
+
+        if self._redis is not None:
+            try:
+                self._redis.set(REDIS_PREFIX + key, page, ex=self.ttl)
+            except redis.RedisError as e:
+                current_app.logger.warning(f"Response cache: Redis unavailable: {e}")
+
+    def _store(self, key, page):
+        """Add to the LRU, evicting the least recently used pages"""
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+response_cache = ResponseCache()
+
+def cached_response(view):
+    """
+    Cache a page view's rendered HTML per upload generation, URL and language
+
+    Pages showing flashed messages and pages whose view called
+    skip_response_cache() (error states) are not cached.
+
+    Usage:
+        @bp.route('/')
+        @login_required
+        @cached_response
+        def index():
+            ...
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        cache = current_app.extensions.get('response_cache')
+        if cache is None or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        key = f"{cache.generation()}:{request.full_path}:{session.get('language', 'en')}"
+        page = cache.get(key)
+        if page is not None:
+            return page
+
+        g.skip_response_cache = False
+        page = view(*args, **kwargs)
+        if isinstance(page, str) and not g.skip_response_cache:
+            cache.set(key, page)
+        return page
+    return decorated_function
+
+def skip_response_cache():
+    """Do not cache the page of the current request (e.g. it shows an error)"""
+    g.skip_response_cache = True
@@ -2,23 +2,65 @@
 Local data uploader script
 
 This script uploads the latest price comparison Excel file
-to the Railway web application via API.
+to the Railway web application via API (as a compact gzip CSV or
+Parquet table when the server accepts one). After the first upload of
+a day only the rows of changed models are sent (delta upload).
 
 Usage:
     python web_uploader/uploader.py
 """
+import gzip
+import hashlib
+import io
+import json
 import os
 import sys
-import glob
+import time
 import configparser
 import requests
+import pandas as pd
 from pathlib import Path
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Add parent directory to path for imports
 parent_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(parent_dir))
 
+from utils.output_manifest import COMPARISON_SOURCE, latest_output
+from utils.price_columns import PRICES_SHEET, load_prices
+
+try:
+    import pyarrow  # noqa: F401 - pandas Parquet engine
+except ImportError:  # Parquet payloads are not offered without pyarrow
+    pyarrow = None
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Compact payloads in order of preference (smallest first): Content-Type -> file suffix
+# Sent only when the server advertises them (GET <api url>/formats)
+COMPACT_FORMATS = {
+    'text/csv': '.csv.gz',
+    **({'application/vnd.apache.parquet': '.parquet'} if pyarrow is not None else {}),
+    'application/x-ndjson': '.ndjson.gz',
+}
+
+# 'Price Comparison' columns sent in compact payloads (prices go as numbers)
+COMPACT_COLUMNS = ['Quantity', 'Model', 'Product Name', 'Our Price']
+
+# Uploads are processed in the background - poll job status this often, this long
+JOB_POLL_INTERVAL = 2
+JOB_TIMEOUT = 600
+
+# Requests are retried on connection errors and 502/503/504, waiting 2, 4, 8... seconds
+# (also POSTs: the server recognises a file or delta it already has)
+REQUEST_RETRIES = 5
+RETRY_BACKOFF = 2
+
+# What was last uploaded (next to config.ini) - delta uploads are computed against it
+STATE_FILE = 'upload_state.json'
+
 class PriceDataUploader:
     """Upload price comparison data to web application"""
     
@@ -28,6 +70,25 @@ class PriceDataUploader:
         self.api_url = self.config.get('API', 'url')
         self.api_key = self.config.get('API', 'key')
         self.data_dir = Path(self.config.get('LOCAL', 'data_directory'))
+        self.state_path = Path(config_path).with_name(STATE_FILE)
+        self.session = self.create_session()
+    
+    def create_session(self):
+        """HTTP session: pooled connections, retries with backoff, API key header"""
+        retry = Retry(
+            total=REQUEST_RETRIES,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=None,  # Retry POST too
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retry)
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['X-API-Key'] = self.api_key
+        return session
     
     def load_config(self, config_path):
         """Load configuration from INI file"""
@@ -69,22 +130,176 @@ class PriceDataUploader:
         Returns:
             Path: Path to the latest file or None
         """
-        pattern = str(self.data_dir / 'price_comparison_*.xlsx')
-        files = glob.glob(pattern)
+        latest_file = latest_output(COMPARISON_SOURCE, self.data_dir)
         
-        if not files:
+        if latest_file is None:
             print(f"[ERROR] No price comparison files found in: {self.data_dir}")
             print(f"[INFO] Looking for pattern: price_comparison_*.xlsx")
             return None
         
-        # Sort by modification time, get the latest
-        latest_file = max(files, key=os.path.getmtime)
-        return Path(latest_file)
+        return latest_file
+    
+    def negotiate_format(self):
+        """
+        Choose the payload format: the first compact format the server accepts
+        
+        Returns:
+            tuple: (Content-Type - XLSX_CONTENT_TYPE for servers without compact
+                formats, whether the server accepts delta uploads)
+        """
+        try:
+            response = self.session.get(f"{self.api_url.rstrip('/')}/formats", timeout=30)
+            server = response.json() if response.status_code == 200 else {}
+        except (requests.exceptions.RequestException, ValueError):
+            server = {}
+        
+        accepted = server.get('formats', [])
+        content_type = next((content_type for content_type in COMPACT_FORMATS if content_type in accepted), XLSX_CONTENT_TYPE)
+        return content_type, bool(server.get('delta'))
+    
+    def build_table(self, file_path):
+        """
+        Compact table of the comparison workbook
+        
+        The 'Price Comparison' columns the server reads plus the numeric
+        <SOURCE>_regular/_discount/_final prices.
+        
+        Args:
+            file_path: Path to Excel file
+        
+        Returns:
+            DataFrame: one row per comparison row
+        """
+        with pd.ExcelFile(file_path) as xls:
+            comparison = xls.parse('Price Comparison')
+            prices = xls.parse(PRICES_SHEET) if PRICES_SHEET in xls.sheet_names else None
+        
+        table = comparison.reindex(columns=COMPACT_COLUMNS)
+        table['Model'] = table['Model'].astype(str).where(table['Model'].notna())
+        return pd.concat([table, load_prices(comparison, prices)], axis=1)
+    
+    def encode_table(self, table, content_type):
+        """
+        Serialize a compact table
+        
+        Args:
+            table: DataFrame from build_table (or some of its rows)
+            content_type: Content-Type from COMPACT_FORMATS
+        
+        Returns:
+            bytes: payload
+        """
+        if content_type == 'application/vnd.apache.parquet':
+            buffer = io.BytesIO()
+            table.to_parquet(buffer, index=False, compression='zstd')
+            return buffer.getvalue()
+        # mtime=0: same data, same bytes (the server skips files it already has)
+        if content_type == 'application/x-ndjson':
+            return gzip.compress(table.to_json(orient='records', lines=True).encode('utf-8'), mtime=0)
+        return gzip.compress(table.to_csv(index=False).encode('utf-8'), mtime=0)
+    
+    def row_hashes(self, table):
+        """
+        SHA-256 of the rows of each model (what a delta is computed from)
+        
+        Returns:
+            dict: model -> hash, None if rows can not be told apart (multi-line cells)
+        """
+        lines = table.to_csv(index=False, header=False, lineterminator='\n').split('\n')[:-1]
+        if len(lines) != len(table):
+            return None
+        
+        hashes = {}
+        for model, line in zip(table['Model'].fillna(''), lines):
+            hashes.setdefault(model, hashlib.sha256()).update(line.encode('utf-8') + b'\n')
+        return {model: digest.hexdigest() for model, digest in hashes.items()}
+    
+    def load_state(self):
+        """Last confirmed upload (None if unknown)"""
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def save_state(self, upload_date, content_hash, rows):
+        """Remember a confirmed upload - the next delta is computed against it"""
+        state = {
+            'api_url': self.api_url,
+            'upload_date': upload_date,
+            'content_hash': content_hash,
+            'rows': rows
+        }
+        temp_path = self.state_path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+    
+    def build_delta(self, table, rows):
+        """
+        Rows of models changed since the last confirmed upload
+        
+        Args:
+            table: DataFrame from build_table
+            rows: row_hashes(table)
+        
+        Returns:
+            dict: base_hash, table (changed models' rows), removed (models),
+                None if there is no usable last upload
+        """
+        state = self.load_state()
+        if rows is None or not state or state.get('api_url') != self.api_url:
+            return None
+        
+        previous = state['rows']
+        changed = {model for model, digest in rows.items() if previous.get(model) != digest}
+        return {
+            'base_hash': state['content_hash'],
+            'table': table[table['Model'].fillna('').isin(changed)],
+            'removed': [model for model in previous if model not in rows]
+        }
+    
+    def post_upload(self, payload_name, payload, content_type, content_hash, delta=None):
+        """
+        POST one upload (full file or delta)
+        
+        Args:
+            payload_name: File name sent to the server
+            payload: File content
+            content_type: Content-Type of the payload
+            content_hash: SHA-256 of the full file
+            delta: dict with base_hash and removed models for a delta upload
+        
+        Returns:
+            requests.Response
+        """
+        # Lets the server skip a file it already has
+        headers = {'X-Content-SHA256': content_hash}
+        data = {}
+        if delta is not None:
+            headers['X-Base-SHA256'] = delta['base_hash']
+            data['removed'] = json.dumps(delta['removed'])
+        
+        print(f"[INFO] Sending request to: {self.api_url}")
+        print("[INFO] Please wait...")
+        
+        return self.session.post(
+            self.api_url,
+            headers=headers,
+            data=data,
+            files={'file': (payload_name, payload, content_type)},
+            timeout=60
+        )
     
     def upload_file(self, file_path):
         """
         Upload file to web application
         
+        Sends a compact payload (gzip CSV / Parquet / gzip NDJSON) built from
+        the workbook when the server accepts one, the workbook itself otherwise.
+        When the server still has the last upload, only the rows of models
+        changed since are sent (delta); if it does not, the full table is.
+        
         Args:
             file_path: Path to Excel file
         
@@ -96,49 +311,75 @@ class PriceDataUploader:
         print(f"[INFO] Modified: {datetime.fromtimestamp(file_path.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')}")
         
         try:
-            # Prepare request
-            headers = {
-                'X-API-Key': self.api_key
-            }
+            content_type, delta_supported = self.negotiate_format()
+            rows = delta = None
+            if content_type == XLSX_CONTENT_TYPE:
+                payload_name, payload = file_path.name, file_path.read_bytes()
+            else:
+                payload_name = file_path.stem + COMPACT_FORMATS[content_type]
+                table = self.build_table(file_path)
+                payload = self.encode_table(table, content_type)
+                rows = self.row_hashes(table)
+                if delta_supported:
+                    delta = self.build_delta(table, rows)
+                print(f"[INFO] Full table as {content_type}: {len(payload) / 1024:.2f} KB")
             
-            with open(file_path, 'rb') as f:
-                files = {
-                    'file': (file_path.name, f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-                }
-                
-                print(f"[INFO] Sending request to: {self.api_url}")
-                print("[INFO] Please wait...")
+            content_hash = hashlib.sha256(payload).hexdigest()
+            
+            response = None
+            if delta is not None:
+                delta_payload = self.encode_table(delta['table'], content_type)
+                print(f"[INFO] Delta: {len(delta['table'])} changed rows, {len(delta['removed'])} removed models "
+                      f"({len(delta_payload) / 1024:.2f} KB)")
+                response = self.post_upload(payload_name, delta_payload, content_type, content_hash, delta)
                 
-                response = requests.post(
-                    self.api_url,
-                    headers=headers,
-                    files=files,
-                    timeout=60
-                )
+                if response.status_code == 409 and response.json().get('full_upload_required'):
+                    print("[INFO] Server no longer has the last upload - sending the full table")
+                    response = None
+            
+            if response is None:
+                response = self.post_upload(payload_name, payload, content_type, content_hash)
             
-            # Check response
-            if response.status_code == 200:
+            # Check response (202: accepted, processed in the background)
+            if response.status_code in (200, 202):
                 data = response.json()
                 
                 if data.get('success'):
-                    print("\n[SUCCESS] File uploaded successfully!")
-                    print(f"[INFO] Upload ID: {data.get('upload_id')}")
+                    print(f"\n[INFO] Upload ID: {data.get('upload_id')}")
                     print(f"[INFO] Upload Date: {data.get('upload_date')}")
                     
+                    if data.get('duplicate'):
+                        print("\n[INFO] Server already has this file - nothing changed")
+                        if rows is not None:
+                            self.save_state(data.get('upload_date'), content_hash, rows)
+                        if 'statistics' in data:
+                            self.print_statistics(data['statistics'])
+                        return True
+                    
+                    if data.get('status') == 'processing':
+                        data = self.wait_for_upload(data['job_id'])
+                        if data is None:
+                            return False
+                    
+                    # Confirmed - the next upload can be a delta against this one
+                    if rows is not None:
+                        self.save_state(data.get('upload_date'), content_hash, rows)
+                    
+                    print("\n[SUCCESS] File uploaded successfully!")
+                    
                     if 'statistics' in data:
-                        stats = data['statistics']
-                        print("\n=== Statistics ===")
-                        print(f"Total Products: {stats.get('total_products', 0)}")
-                        print(f"Total Value: {stats.get('total_value', 0):.2f} GEL")
-                        print(f"Products Cheaper: {stats.get('products_cheaper', 0)}")
-                        print(f"Products Expensive: {stats.get('products_expensive', 0)}")
-                        print(f"No Competitors: {stats.get('products_no_competitors', 0)}")
+                        self.print_statistics(data['statistics'])
                     
                     return True
                 else:
                     print(f"\n[ERROR] Upload failed: {data.get('error', 'Unknown error')}")
                     return False
             
+            elif response.status_code == 409:
+                print(f"\n[ERROR] {response.json().get('error', 'Upload already in progress')}")
+                print("[INFO] Wait for it to finish and try again")
+                return False
+            
             elif response.status_code == 401:
                 print("\n[ERROR] Authentication failed - Invalid API key")
                 print("[INFO] Please check your API key in config.ini")
@@ -180,6 +421,48 @@ class PriceDataUploader:
             traceback.print_exc()
             return False
     
+    def wait_for_upload(self, job_id):
+        """
+        Poll upload job status until the server has processed the file
+        
+        Args:
+            job_id: Job ID from the upload response
+        
+        Returns:
+            dict: final job status (with statistics), None if failed or timed out
+        """
+        status_url = f"{self.api_url.rstrip('/')}/{job_id}"
+        deadline = time.monotonic() + JOB_TIMEOUT
+        
+        print("[INFO] Server is processing the file...")
+        while time.monotonic() < deadline:
+            time.sleep(JOB_POLL_INTERVAL)
+            
+            response = self.session.get(status_url, timeout=30)
+            if response.status_code != 200:
+                print(f"\n[ERROR] Status check failed with status code: {response.status_code}")
+                return None
+            
+            data = response.json()
+            if data.get('status') == 'completed':
+                return data
+            if data.get('status') == 'failed':
+                print(f"\n[ERROR] Upload failed: {data.get('error') or 'Unknown error'}")
+                return None
+        
+        print(f"\n[ERROR] Upload still processing after {JOB_TIMEOUT} seconds")
+        print(f"[INFO] Check status later: {status_url}")
+        return None
+    
+    def print_statistics(self, stats):
+        """Print upload statistics"""
+        print("\n=== Statistics ===")
+        print(f"Total Products: {stats.get('total_products', 0)}")
+        print(f"Total Value: {stats.get('total_value', 0):.2f} GEL")
+        print(f"Products Cheaper: {stats.get('products_cheaper', 0)}")
+        print(f"Products Expensive: {stats.get('products_expensive', 0)}")
+        print(f"No Competitors: {stats.get('products_no_competitors', 0)}")
+    
     def run(self):
         """Run the uploader"""
         print("="*60)